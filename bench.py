@@ -0,0 +1,240 @@
+"""Бенчмарк горячих путей календаря без окна
+
+Генерирует calendar_data.json на 1k/10k/100k дней во временной папке и
+замеряет основные операции CalendarApp. Результат - JSON (время, пиковая
+память, число виджетов), который можно сравнивать между коммитами:
+
+    python bench.py --sizes 1000 10000 --output bench.json
+    python bench.py --grid canvas --output bench-canvas.json
+    python bench.py --memory --sizes 100000
+"""
+import os
+
+# Настоящее окно SDL2 без экрана: без окна dp() и Widget() завершают процесс.
+# Clock не ограничивает FPS
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+os.environ.setdefault('KIVY_WINDOW', 'sdl2')
+os.environ.setdefault('KCFG_GRAPHICS_MAXFPS', '0')
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+PALETTE = ['#FF6B6B', '#FFD166', '#06D6A0', '#118AB2', '#9B59B6', '#34495E', '#FFFFFF']
+WORDS = ['встреча', 'отчет', 'звонок', 'врач', 'купить', 'молоко', 'проект', 'дедлайн',
+         'день', 'рождения', 'оплатить', 'счет', 'тренировка', 'поездка', 'meeting']
+
+
+def generate_data(days, seed=1):
+    """Синтетические данные: days подряд идущих дней до сегодняшнего"""
+    rng = random.Random(seed)
+    today = date.today()
+    data = {}
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        note = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))) if rng.random() < 0.6 else ''
+        data[day.isoformat()] = {
+            'color': rng.choice(PALETTE),
+            'note': note,
+            'last_modified': datetime(day.year, day.month, day.day, 12).isoformat()
+        }
+    return data
+
+
+def count_widgets(app):
+    """Число виджетов в дереве приложения (все вкладки) и в открытом редакторе"""
+    # Обход корня видит только содержимое текущей вкладки; без run() app.root пуст
+    roots = [app.root or app.tabs] + [tab.content for tab in app.tabs.tab_list if tab.content is not None]
+    popup = getattr(app, 'day_editor_popup', None)
+    if popup is not None:
+        roots.append(popup)
+    return len({widget for root in roots for widget in root.walk(restrict=True)})
+
+
+def settle():
+    """Прогоняет отложенные Clock-колбэки (раскладка, RecycleView)"""
+    from kivy.clock import Clock
+    Clock.tick()
+
+
+def measure(app, operation, repeat, setup=None, teardown=None):
+    """Время (медиана и минимум), пиковая память и число виджетов операции"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        operation()
+        settle()
+        times.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+
+    # Память замеряется отдельным прогоном: tracemalloc искажает время
+    if setup:
+        setup()
+    tracemalloc.start()
+    operation()
+    settle()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    widgets = count_widgets(app)
+    if teardown:
+        teardown()
+
+    return {
+        'wall_ms_median': round(statistics.median(times) * 1000, 3),
+        'wall_ms_min': round(min(times) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'widgets': widgets
+    }
+
+
+def bench_size(days, repeat):
+    """Все операции для одного размера данных"""
+    import main as calendar_main
+
+    with open('calendar_data.json', 'w', encoding='utf-8') as f:
+        json.dump(generate_data(days), f, ensure_ascii=False, indent=2)
+
+    app = calendar_main.CalendarApp()
+
+    def wait_loaded():
+        # Фоновая загрузка завершается колбэками Clock
+        while app.loading:
+            settle()
+            time.sleep(0.001)
+
+    def wait_jobs():
+        # Большие списки строятся планировщиком за несколько кадров
+        while app.jobs.active:
+            settle()
+
+    def build_notes_list():
+        app.update_notes_list()
+        wait_jobs()
+
+    app.build()
+    wait_loaded()
+    some_day = next(iter(app.iter_notes()), (date.today().isoformat(), {}))[0]
+
+    def reload():
+        app.persistence.stop()
+        app.store.close()
+        app.load_data()
+        wait_loaded()
+
+    def open_notes():
+        if app.notes_view is None:
+            app.create_notes_tab()
+
+    def open_editor():
+        app.selected_day = some_day
+        app.show_day_editor()
+
+    def close_editor():
+        app.day_editor_popup.dismiss()
+
+    created_before = calendar_main.DayButton.created
+    results = {
+        'load_data': measure(app, reload, repeat),
+        'save_data': measure(app, app.save_data, repeat),
+        'update_calendar': measure(app, app.update_calendar, repeat),
+        'next_month': measure(app, lambda: app.next_month(None), repeat),
+        'prev_month': measure(app, lambda: app.prev_month(None), repeat),
+        'update_notes_list': measure(app, build_notes_list, repeat, setup=open_notes),
+        'show_day_editor': measure(app, open_editor, repeat, teardown=close_editor),
+    }
+    results['next_month']['grid_allocations'] = calendar_main.DayButton.created - created_before
+    from texture_cache import text_cache
+    results['texture_cache'] = text_cache.stats()
+    app.on_stop()
+    return results
+
+
+def bench_memory(days):
+    """Память данных в словарях JSON и в компактных записях (CompactDays)"""
+    from records import CompactDays
+
+    text = json.dumps(generate_data(days), ensure_ascii=False)
+    results = {}
+    for name, build in (('dicts', json.loads), ('compact', lambda text: CompactDays(json.loads(text)))):
+        gc.collect()
+        tracemalloc.start()
+        data = build(text)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'retained_kb': round(current / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'bytes_per_day': round(current / days, 1)
+        }
+        del data
+    results['compact_to_dicts'] = round(results['compact']['retained_kb'] / results['dicts']['retained_kb'], 3)
+    return results
+
+
+def git_revision():
+    """Текущий коммит, если доступен"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк календаря без окна')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--storage', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--grid', choices=['widgets', 'canvas'], default='widgets')
+    parser.add_argument('--memory', action='store_true', help='только сравнить память представлений данных')
+    parser.add_argument('--output', help='файл для JSON (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    os.environ['CALENDAR_STORAGE'] = args.storage
+    os.environ['CALENDAR_GRID'] = args.grid
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'storage': args.storage,
+        'grid': args.grid,
+        'results': {}
+    }
+    cwd = os.getcwd()
+    for days in args.sizes:
+        if args.memory:
+            report['results'][str(days)] = bench_memory(days)
+            continue
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                report['results'][str(days)] = bench_size(days, args.repeat)
+            finally:
+                os.chdir(cwd)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+from functools import lru_cache
+
+from kivy.utils import get_color_from_hex
+
+# Палитра редактора дня: (HEX, название)
+PALETTE = [
+    ('#FF6B6B', 'Красный'),
+    ('#FFD166', 'Желтый'),
+    ('#06D6A0', 'Зеленый'),
+    ('#118AB2', 'Синий'),
+    ('#9B59B6', 'Фиолетовый'),
+    ('#FF9A76', 'Оранжевый'),
+    ('#A7E9AF', 'Салатовый'),
+    ('#78C1D5', 'Голубой'),
+    ('#D4A5A5', 'Бежевый'),
+    ('#FFFFFF', 'Белый'),
+    ('#E74C3C', 'Темно-красный'),
+    ('#2ECC71', 'Ярко-зеленый'),
+    ('#3498DB', 'Небесно-синий'),
+    ('#F1C40F', 'Золотой'),
+    ('#1ABC9C', 'Бирюзовый'),
+    ('#34495E', 'Темно-серый'),
+    ('#ECF0F1', 'Светло-серый'),
+    ('#BDC3C7', 'Серый'),
+    ('#7F8C8D', 'Стальной'),
+    ('#2C3E50', 'Чернильный')
+]
+
+
+@lru_cache(maxsize=256)
+def parse_color(hex_color):
+    """RGBA из HEX; каждый цвет разбирается один раз"""
+    return tuple(get_color_from_hex(hex_color))
@@ -0,0 +1,100 @@
+import sys
+from collections import deque
+
+# Примерная стоимость в байтах: операция, одна дата в ней, одна версия дня
+ENTRY_COST = 200
+DATE_COST = 160
+VERSION_COST = 120
+
+
+def version_cost(version):
+    """Примерный размер версии дня или правила, который держит история"""
+    if version is None:
+        return 0
+    note = version.get('note')
+    return VERSION_COST + (sys.getsizeof(note) if isinstance(note, str) else 0)
+
+
+def versions_size(versions):
+    """Примерный объем версий: дата или правило -> (до, после)"""
+    return sum(DATE_COST + version_cost(before) + version_cost(after) for before, after in versions.values())
+
+
+class HistoryEntry:
+    """Одна операция: даты и правила с версиями (до, после); None - записи нет
+
+    days_size - уже посчитанный versions_size(days), если операция
+    собиралась по частям.
+    """
+    __slots__ = ('label', 'days', 'rules', 'size')
+
+    def __init__(self, label, days, rules, days_size=None):
+        self.label = label
+        self.days = days
+        self.rules = rules
+        if days_size is None:
+            days_size = versions_size(days)
+        self.size = ENTRY_COST + days_size + versions_size(rules)
+
+
+class History:
+    """Стек отмены и повтора из дельт операций
+
+    Операция хранит только измененные даты с версиями до и после. Версии -
+    неизменяемые DayRecord, общие с saved_data, поэтому запись операции не
+    копирует данные. Объем стеков ограничен примерным числом байт: старые
+    операции вытесняются, а операция больше всего лимита не записывается
+    вовсе - это стоит проверить через fits и предупредить пользователя.
+    Прежние операции при этом остаются: каждая отменяет только свои даты.
+    """
+    def __init__(self, limit_bytes=8 * 1024 * 1024):
+        self.limit_bytes = limit_bytes
+        self.undo_stack = deque()
+        self.redo_stack = []
+        # Общий объем обоих стеков
+        self.size = 0
+
+    def fits(self, days, rules=None, days_size=None):
+        """Поместится ли операция с такими версиями в лимит истории"""
+        return HistoryEntry(None, days, rules or {}, days_size).size <= self.limit_bytes
+
+    def record(self, label, days, rules=None, days_size=None):
+        """Записывает операцию; False, если она больше всего лимита"""
+        entry = HistoryEntry(label, days, rules or {}, days_size)
+        # Новая операция делает повтор отмененных невозможным
+        while self.redo_stack:
+            self.size -= self.redo_stack.pop().size
+        if entry.size > self.limit_bytes:
+            return False
+        self.undo_stack.append(entry)
+        self.size += entry.size
+        while self.size > self.limit_bytes:
+            self.size -= self.undo_stack.popleft().size
+        return True
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Операция для отмены (переходит в стек повтора) или None"""
+        if not self.undo_stack:
+            return None
+        entry = self.undo_stack.pop()
+        self.redo_stack.append(entry)
+        return entry
+
+    def redo(self):
+        """Операция для повтора (возвращается в стек отмены) или None"""
+        if not self.redo_stack:
+            return None
+        entry = self.redo_stack.pop()
+        self.undo_stack.append(entry)
+        return entry
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.size = 0
@@ -0,0 +1,333 @@
+import heapq
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+
+def has_note(day_data):
+    """Есть ли у дня непустая заметка"""
+    note = day_data.get('note', '')
+    return isinstance(note, str) and bool(note.strip())
+
+
+class MonthSummary:
+    """Сводка месяца: дни с цветом, дни с заметками, цвета по дням и их частоты"""
+    __slots__ = ('colored', 'notes', 'colors', 'day_colors')
+
+    def __init__(self, month_data, days_in_month):
+        self.colored = 0
+        self.notes = 0
+        self.colors = Counter()
+        self.day_colors = [None] * days_in_month
+        for date_str, day_data in month_data.items():
+            color = day_data.get('color')
+            if color is not None:
+                # Старые цвета-списки считаются по значению
+                key = color if isinstance(color, str) else tuple(color)
+                self.colored += 1
+                self.colors[key] += 1
+                self.day_colors[int(date_str[8:10]) - 1] = key
+            if has_note(day_data):
+                self.notes += 1
+
+
+class MonthStats:
+    """Сводки по месяцам, пересчитываемые только для измененных месяцев
+
+    Сводка строится из данных одного месяца (не больше 31 дня) при первом
+    запросе и сбрасывается, когда меняется любой день месяца.
+    """
+    def __init__(self):
+        self.months = {}
+
+    def month(self, year, month, load_month, days_in_month):
+        """Сводка месяца; load_month(year, month) дает данные при пересчете"""
+        key = (year, month)
+        summary = self.months.get(key)
+        if summary is None:
+            summary = self.months[key] = MonthSummary(load_month(year, month), days_in_month)
+        return summary
+
+    def invalidate(self, date_strs):
+        """Сбрасывает сводки месяцев измененных дней"""
+        for date_str in date_strs:
+            self.months.pop((int(date_str[:4]), int(date_str[5:7])), None)
+
+    def clear(self):
+        self.months.clear()
+
+
+class NotesIndex:
+    """Отсортированный по дате список дней с заметками"""
+    def __init__(self):
+        self.dates = []
+
+    def build(self, data):
+        """Строит индекс по всем данным"""
+        self.dates = sorted(date_str for date_str, day_data in data.items() if has_note(day_data))
+
+    def set(self, date_str, day_data):
+        """Добавляет день или убирает его, если заметка стала пустой"""
+        if has_note(day_data):
+            self.add(date_str)
+        else:
+            self.remove(date_str)
+
+    def add(self, date_str):
+        """Вставляет дату, сохраняя порядок"""
+        pos = bisect_left(self.dates, date_str)
+        if pos == len(self.dates) or self.dates[pos] != date_str:
+            self.dates.insert(pos, date_str)
+
+    def remove(self, date_str):
+        """Убирает дату"""
+        pos = bisect_left(self.dates, date_str)
+        if pos < len(self.dates) and self.dates[pos] == date_str:
+            del self.dates[pos]
+
+    def update(self, date_strs, noted):
+        """Массово заменяет даты date_strs датами noted (те из них, где есть заметка)
+
+        Один проход по списку вместо вставок и удалений по одной дате.
+        """
+        changed = set(date_strs)
+        dates = [date_str for date_str in self.dates if date_str not in changed]
+        dates.extend(noted)
+        # Два отсортированных куска сливаются сортировкой за линейное время
+        dates.sort()
+        self.dates = dates
+
+    def clear(self):
+        """Убирает все даты"""
+        self.dates = []
+
+    def newest_first(self):
+        """Даты от новых к старым"""
+        return reversed(self.dates)
+
+    def between(self, start=None, end=None):
+        """Даты из диапазона [start, end] по возрастанию; None - без границы"""
+        lo = bisect_left(self.dates, start) if start is not None else 0
+        hi = bisect_right(self.dates, end) if end is not None else len(self.dates)
+        return self.dates[lo:hi]
+
+    def __len__(self):
+        return len(self.dates)
+
+
+def color_key(color):
+    """Ключ цвета для сравнения: HEX в верхнем регистре, старые списки - кортежем"""
+    if isinstance(color, str):
+        return color.upper()
+    return tuple(color)
+
+
+class NoteFilterIndex:
+    """Даты заметок по цвету для фильтров списка заметок
+
+    Для каждого цвета хранится свой отсортированный NotesIndex, поэтому
+    фильтр "цвет + диапазон дат" - это два двоичных поиска в списке цвета,
+    а не просмотр всех дней.
+    """
+    def __init__(self):
+        self.notes = NotesIndex()
+        self.colors = {}
+        self.day_colors = {}
+
+    def build(self, notes):
+        """Строит индекс по парам (дата, данные дня)"""
+        self.notes = NotesIndex()
+        self.colors = {}
+        self.day_colors = {}
+        for date_str, day_data in sorted(notes, key=lambda item: item[0]):
+            if not has_note(day_data):
+                continue
+            # Даты идут по порядку, поэтому списки только дописываются
+            self.notes.dates.append(date_str)
+            key = color_key(day_data.get('color', '#FFFFFF'))
+            self.day_colors[date_str] = key
+            self.colors.setdefault(key, NotesIndex()).dates.append(date_str)
+
+    def set(self, date_str, day_data):
+        """Обновляет день; день без заметки из индекса убирается"""
+        self.remove(date_str)
+        if day_data is None or not has_note(day_data):
+            return
+        key = color_key(day_data.get('color', '#FFFFFF'))
+        self.notes.add(date_str)
+        self.day_colors[date_str] = key
+        self.colors.setdefault(key, NotesIndex()).add(date_str)
+
+    def remove(self, date_str):
+        """Убирает день из индекса"""
+        key = self.day_colors.pop(date_str, None)
+        if key is None:
+            return
+        self.notes.remove(date_str)
+        dates = self.colors[key]
+        dates.remove(date_str)
+        if not dates:
+            del self.colors[key]
+
+    def query(self, color=None, start=None, end=None):
+        """Даты заметок цвета color из диапазона [start, end] по возрастанию"""
+        dates = self.notes if color is None else self.colors.get(color_key(color))
+        if dates is None:
+            return []
+        return dates.between(start, end)
+
+    def matches(self, date_str, color=None, start=None, end=None):
+        """Проходит ли заметка дня те же условия, что и в query"""
+        key = self.day_colors.get(date_str)
+        return (key is not None
+                and (color is None or key == color_key(color))
+                and (start is None or date_str >= start)
+                and (end is None or date_str <= end))
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре (кириллица поддерживается, ё -> е)"""
+    return TOKEN_RE.findall(text.casefold().replace('ё', 'е'))
+
+
+class NoteSearchIndex:
+    """Инвертированный индекс по тексту заметок с поиском по префиксу"""
+    # Префиксы короче этого ищутся только как целые слова
+    MIN_PREFIX = 3
+
+    def __init__(self):
+        self.postings = {}
+        self.doc_tokens = {}
+        self.vocabulary = []
+
+    def build(self, notes):
+        """Строит индекс по парам (дата, текст заметки)"""
+        for done in self.build_steps(notes):
+            pass
+
+    def build_steps(self, notes, step=500):
+        """Строит индекс порциями по step заметок, отдавая число готовых"""
+        self.postings = {}
+        self.doc_tokens = {}
+        self.vocabulary = []
+        done = 0
+        for date_str, note in notes:
+            self.index_document(date_str, note)
+            done += 1
+            if done % step == 0:
+                yield done
+        self.vocabulary = sorted(self.postings)
+
+    def index_document(self, date_str, note):
+        """Добавляет заметку, возвращает новые слова словаря"""
+        counts = {}
+        for token in tokenize(note):
+            counts[token] = counts.get(token, 0) + 1
+        new_tokens = []
+        for token, count in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                new_tokens.append(token)
+            posting[date_str] = count
+        if counts:
+            self.doc_tokens[date_str] = tuple(counts)
+        return new_tokens
+
+    def set(self, date_str, note):
+        """Обновляет заметку дня"""
+        self.remove(date_str)
+        for token in self.index_document(date_str, note or ''):
+            pos = bisect_left(self.vocabulary, token)
+            self.vocabulary.insert(pos, token)
+
+    def remove(self, date_str):
+        """Убирает заметку дня из индекса"""
+        for token in self.doc_tokens.pop(date_str, ()):
+            posting = self.postings[token]
+            del posting[date_str]
+            if not posting:
+                del self.postings[token]
+                pos = bisect_left(self.vocabulary, token)
+                del self.vocabulary[pos]
+
+    def expand(self, term):
+        """Слова словаря, начинающиеся с term"""
+        if len(term) < self.MIN_PREFIX:
+            return [term] if term in self.postings else []
+        # Слова с префиксом идут подряд до первого слова больше любого из них
+        start = bisect_left(self.vocabulary, term)
+        end = bisect_left(self.vocabulary, term[:-1] + chr(ord(term[-1]) + 1), start)
+        return self.vocabulary[start:end]
+
+    def search(self, query, limit=None):
+        """Даты заметок, содержащих все слова запроса (по префиксу), лучшие сначала
+
+        limit - сколько лучших дат вернуть; по умолчанию все найденные.
+        """
+        terms = []
+        for term in set(tokenize(query)):
+            tokens = self.expand(term)
+            if not tokens:
+                return []
+            size = sum(len(self.postings[token]) for token in tokens)
+            terms.append((size, term, tokens))
+        if not terms:
+            return []
+        # Начинаем с самого редкого слова, остальные только сужают кандидатов
+        terms.sort()
+        scores = None
+        # Вес слова, счетчики которого взяты в scores как есть, без копии
+        scale = 1
+        for size, term, tokens in terms:
+            if scores is None and len(tokens) == 1:
+                scores = self.postings[tokens[0]]
+                scale = 2 if tokens[0] == term else 1
+                continue
+            if scores is None:
+                scores = {}
+                for token in tokens:
+                    # Точное совпадение слова весит больше, чем совпадение префикса
+                    weight = 2 if token == term else 1
+                    for date_str, count in self.postings[token].items():
+                        scores[date_str] = scores.get(date_str, 0) + weight * count
+                continue
+            if len(tokens) == 1:
+                # Одно слово сужает кандидатов одним включением словаря
+                posting = self.postings[tokens[0]]
+                weight = 2 if tokens[0] == term else 1
+                if len(posting) < len(scores):
+                    scores = {date_str: scale * scores[date_str] + weight * count
+                              for date_str, count in posting.items() if date_str in scores}
+                else:
+                    scores = {date_str: scale * count + weight * posting[date_str]
+                              for date_str, count in scores.items() if date_str in posting}
+            else:
+                narrowed = {}
+                for token in tokens:
+                    weight = 2 if token == term else 1
+                    posting = self.postings[token]
+                    if len(posting) < len(scores):
+                        matches = ((date_str, count) for date_str, count in posting.items() if date_str in scores)
+                    else:
+                        matches = ((date_str, posting[date_str]) for date_str in scores if date_str in posting)
+                    for date_str, count in matches:
+                        narrowed[date_str] = narrowed.get(date_str, scale * scores[date_str]) + weight * count
+                scores = narrowed
+            scale = 1
+            if not scores:
+                return []
+        return self.ranked(scores, limit)
+
+    @staticmethod
+    def ranked(scores, limit=None):
+        """Даты по убыванию веса, при равном весе новые выше"""
+        if limit is not None:
+            return [date_str for date_str, score in heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))]
+        # Две сортировки без Python-ключа быстрее одной по кортежу: вторая устойчива
+        dates = sorted(scores, reverse=True)
+        dates.sort(key=scores.__getitem__, reverse=True)
+        return dates
@@ -1,20 +1,87 @@
+import time
+
+# Отметка старта процесса для отчета о времени запуска
+PROCESS_START = time.perf_counter()
+
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.popup import Popup
 from kivy.uix.scrollview import ScrollView
-from kivy.uix.textinput import TextInput
+from kivy.effects.scroll import ScrollEffect
+from kivy.animation import Animation
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.core.window import Window
-from datetime import datetime
+from datetime import datetime, timedelta
 import calendar
+import gc
+from collections import OrderedDict, namedtuple
 import json
 import os
-from kivy.utils import get_color_from_hex
+import threading
+from types import SimpleNamespace
 from kivy.config import Config
 from kivy.metrics import dp
+from kivy.logger import Logger
+from kivy.clock import Clock
+from colors import PALETTE, parse_color
+from texture_cache import CachedLabel, CachedTextMixin, text_cache
+from perf import Profiler
+from scheduler import FrameScheduler
+from history import History, versions_size
+from storage import JournalStore, SqliteStore, PersistenceWorker
+from indexes import MonthStats, NoteFilterIndex, NotesIndex, NoteSearchIndex, color_key, has_note
+from records import CompactDays, DayRecord
+from recurrence import RecurrenceEngine
+
+IMPORTS_DONE = time.perf_counter()
+
+# Сколько загруженных дней вливается в данные за один шаг планировщика
+LOAD_MERGE_STEP = 1000
+
+# Сколько карточек заметок собирается за один шаг планировщика
+NOTES_BUILD_STEP = 500
+# Карточек в одной странице списка заметок; следующая дописывается при прокрутке
+NOTES_PAGE = 200
+
+# Изменения большего числа дней перерисовываются целиком
+BULK_REFRESH_THRESHOLD = 20
+# Дней за шаг массового изменения; пакет больше применяется по кадрам
+BULK_APPLY_STEP = 500
+
+# Сколько месяцев с готовыми ячейками держится в памяти
+MONTH_CACHE_SIZE = 5
+
+# Первая синхронизация после запуска и период фоновой синхронизации, секунды
+SYNC_START_DELAY = 1
+SYNC_INTERVAL = 60
+
+# Методы, которые замеряет профилировщик
+PROFILED_METHODS = ['load_data', 'save_data', 'update_calendar', 'update_notes_list', 'show_day_editor']
+
+# Варианты повтора в редакторе дня: подпись -> частота правила
+REPEAT_OPTIONS = {
+    'Не повторять': None,
+    'Каждый день': 'daily',
+    'Каждую неделю': 'weekly',
+    'Каждый месяц': 'monthly',
+    'Каждый год': 'yearly'
+}
+
+# Подписи дней недели с понедельника, как в calendar.weekday
+WEEKDAY_NAMES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+# Фильтр заметок по датам: подпись -> вид диапазона
+DATE_FILTER_OPTIONS = {
+    'Все даты': None,
+    'Этот месяц': 'month',
+    'Этот квартал': 'quarter',
+    'Свой диапазон...': 'custom'
+}
+
+# Подпись фильтра заметок без ограничения по цвету
+ALL_COLORS = 'Все цвета'
 
 if os.environ.get('KIVY_BUILD', '') == 'android':
     Config.set('graphics', 'width', '400')
@@ -22,10 +89,29 @@ if os.environ.get('KIVY_BUILD', '') == 'android':
     Config.set('graphics', 'resizable', '0')
     Config.set('kivy', 'exit_on_escape', '0')
 
-class DayButton(Button):
-    """Кнопка дня"""
+MONTH_NAMES = [
+    'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+    'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
+]
+
+# Фон выделенных долгим нажатием дней
+SELECTION_BACKGROUND = (0.25, 0.45, 0.85, 1)
+
+# Оформление ячейки месяца, общее для обоих рендереров сетки
+DayCell = namedtuple('DayCell', 'date_str day text background color bold')
+
+class DayButton(CachedTextMixin, Button):
+    """Кнопка дня; подпись берется из общего кэша текстур"""
+    # Счетчик созданных кнопок (для замера аллокаций при навигации)
+    created = 0
+    # Удержание дольше этого времени - долгое нажатие (секунды)
+    LONG_PRESS_DELAY = 0.5
+    
     def __init__(self, date_str, day_num, is_current_month=True, **kwargs):
+        self.register_event_type('on_long_press')
         super().__init__(**kwargs)
+        self.long_press = None
+        self.long_pressed = False
         self.date_str = date_str
         self.day_num = day_num
         self.is_current_month = is_current_month
@@ -36,40 +122,180 @@ class DayButton(Button):
         self.halign = 'center'
         self.valign = 'middle'
         
+        DayButton.created += 1
+        self.init_cached_text()
+        
         # Настройка внешнего вида
+        self.reset_style()
+    
+    def reset_style(self):
+        """Возвращает оформление по умолчанию"""
+        self.bold = False
         if not self.is_current_month:
             self.color = (0.6, 0.6, 0.6, 1)
             self.background_color = (0.95, 0.95, 0.95, 1)
         else:
             self.color = (0, 0, 0, 1)
             self.background_color = (1, 1, 1, 1)
+    
+    def assign(self, cell):
+        """Перенастраивает ячейку пула на другой день (DayCell) без создания виджета"""
+        self.date_str = cell.date_str
+        self.day_num = cell.day
+        self.is_current_month = cell.date_str is not None
+        self.reset_style()
+        if self.is_current_month:
+            self.background_color = cell.background
+            self.color = cell.color
+            self.bold = cell.bold
+        self.set_cached_text(cell.text, self.font_size, cell.color, cell.bold)
+        self.disabled = not self.is_current_month
+        self.opacity = 1 if self.is_current_month else 0
+    
+    def on_touch_down(self, touch):
+        if self.is_current_month and self.collide_point(*touch.pos):
+            self.long_pressed = False
+            self.long_press = Clock.schedule_once(self.fire_long_press, self.LONG_PRESS_DELAY)
+        return super().on_touch_down(touch)
+    
+    def on_touch_up(self, touch):
+        if self.long_press is not None:
+            self.long_press.cancel()
+            self.long_press = None
+        return super().on_touch_up(touch)
+    
+    def fire_long_press(self, dt):
+        """Удержание: отпускание после него не считается нажатием"""
+        self.long_press = None
+        self.long_pressed = True
+        self.dispatch('on_long_press')
+    
+    def on_long_press(self):
+        """Обработчик события по умолчанию"""
+        pass
+
+class SwipeScrollView(ScrollView):
+    """ScrollView сетки месяца, распознающая горизонтальный свайп"""
+    def __init__(self, on_swipe, **kwargs):
+        super().__init__(**kwargs)
+        self.on_swipe = on_swipe
+        # Горизонтальная прокрутка включена, чтобы свайп не доходил до кнопок
+        # как нажатие; ScrollEffect не дает содержимому сдвигаться
+        self.do_scroll_x = True
+        self.effect_cls = ScrollEffect
+    
+    def on_touch_up(self, touch):
+        dx = touch.x - touch.ox
+        dy = touch.y - touch.oy
+        if (self.collide_point(*touch.opos) and 'swiped' not in touch.ud
+                and abs(dx) > dp(60) and abs(dx) > 2 * abs(dy)):
+            touch.ud['swiped'] = True
+            self.on_swipe(-1 if dx > 0 else 1)
+        return super().on_touch_up(touch)
 
 class CalendarApp(App):
+    def __init__(self, **kwargs):
+        # Событие слоя данных: "дни изменились" (список дат)
+        self.register_event_type('on_days_changed')
+        super().__init__(**kwargs)
+    
     def build(self):
+        # Профилирование выключено по умолчанию (profiling / CALENDAR_PROFILE)
+        self.profiler = None
+        if self.setting_enabled('profiling', 'CALENDAR_PROFILE'):
+            self.start_profiling()
+        
         # Создаем TabbedPanel для вкладок
         self.tabs = TabbedPanel(
             do_default_tab=False,
-            tab_width=dp(200)  # Используем dp
+            tab_width=dp(140)  # Используем dp
         )
         
+        # Долгие операции интерфейса выполняются порциями в бюджете кадра
+        budget_ms = float(self.setting('frame_budget_ms', 'CALENDAR_FRAME_BUDGET', '8'))
+        self.jobs = FrameScheduler(budget_ms / 1000)
+        
+        # Отмена и повтор операций; объем истории ограничен в килобайтах
+        undo_kb = int(self.setting('undo_memory_kb', 'CALENDAR_UNDO_MEMORY_KB', '8192'))
+        self.history = History(undo_kb * 1024)
+        
+        # Дни, выделенные долгим нажатием, для пакетных операций
+        self.selected_days = set()
+        self.selection_anchor = None
+        
+        # Кэш готовых ячеек месяцев; соседние месяцы считаются в простое
+        self.month_cache = OrderedDict()
+        self.month_cache_day = None
+        self.prefetch_trigger = Clock.create_trigger(self.prefetch_adjacent, 0.1)
+        
         # Вкладка 1: Календарь
         self.calendar_tab = TabbedPanelItem(text='📅 Календарь')
         self.create_calendar_tab()
         self.tabs.add_widget(self.calendar_tab)
         
-        # Вкладка 2: Все заметки
+        # Точечное обновление интерфейса после изменения дней
+        self.bind(on_days_changed=self.refresh_changed_cells)
+        self.bind(on_days_changed=self.refresh_changed_notes)
+        self.bind(on_days_changed=self.refresh_year_view)
+        
+        # Редактор дня создается при первом открытии
+        self.day_editor_popup = None
+        
+        # Вкладка 2: Все заметки (строится при первом открытии)
         self.notes_tab = TabbedPanelItem(text='📝 Все заметки')
-        self.create_notes_tab()
+        self.notes_view = None
+        self.notes_tab.content = Label(text='Загрузка заметок...', font_size=dp(16))
         self.tabs.add_widget(self.notes_tab)
         
+        # Вкладка 3: Обзор года (строится при первом открытии)
+        self.year_tab = TabbedPanelItem(text='🗓 Год')
+        self.year_canvas = None
+        self.year_tab.content = Label(text='Загрузка...', font_size=dp(16))
+        self.tabs.add_widget(self.year_tab)
+        self.tabs.bind(current_tab=self.on_tab_switch)
+        
         # Загрузка данных
         self.load_data()
+        self.setup_sync()
         
         # Обновление календаря
         self.update_calendar()
         
+        # Замер времени до первого кадра
+        self.startup_marks = {
+            'imports': IMPORTS_DONE - PROCESS_START,
+            'build': time.perf_counter() - PROCESS_START
+        }
+        if Window is not None:
+            # Без окна (бенчмарки) кадров не будет
+            Window.bind(on_flip=self.on_first_frame)
+        
         return self.tabs
     
+    def on_first_frame(self, *args):
+        """Записывает отчет о времени запуска после первого кадра"""
+        Window.unbind(on_flip=self.on_first_frame)
+        self.startup_marks['first_frame'] = time.perf_counter() - PROCESS_START
+        Logger.info('Startup: ' + ', '.join(
+            f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.startup_marks.items()
+        ))
+        report_path = os.environ.get('CALENDAR_STARTUP_REPORT')
+        if report_path:
+            try:
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.startup_marks, f)
+            except OSError as e:
+                Logger.warning(f'Startup: не удалось записать отчет {report_path}: {e}')
+    
+    def on_tab_switch(self, tabs, tab):
+        """Строит вкладки заметок и года при первом переключении на них"""
+        if tab is self.notes_tab and self.notes_view is None:
+            self.create_notes_tab()
+            self.update_notes_list()
+        elif tab is self.year_tab and self.year_canvas is None:
+            self.create_year_tab()
+            self.update_year_view()
+    
     def create_calendar_tab(self):
         """Создает вкладку календаря"""
         # Основной layout
@@ -100,24 +326,50 @@ class CalendarApp(App):
         
         # Дни недели
         days_layout = GridLayout(cols=7, size_hint_y=0.08, spacing=dp(2))
-        days = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
-        for day in days:
-            lbl = Label(text=day, bold=True, font_size=dp(16))
+        for day in WEEKDAY_NAMES:
+            lbl = CachedLabel(text=day, bold=True, font_size=dp(16))
             days_layout.add_widget(lbl)
         
         calendar_layout.add_widget(days_layout)
         
-        # Календарь
-        self.calendar_grid = GridLayout(
-            cols=7, 
-            spacing=dp(2), 
-            size_hint_y=None,
-            row_default_height=dp(70)  # Фиксированная высота строки
-        )
-        self.calendar_grid.bind(minimum_height=self.calendar_grid.setter('height'))
+        # Горизонтальный свайп по сетке листает месяцы
+        scroll = SwipeScrollView(self.on_month_swipe, size_hint_y=0.75)
+        self.calendar_scroll = scroll
+        self.day_cells = []
+        self.month_canvas = None
+        
+        if self.setting('grid_renderer', 'CALENDAR_GRID', 'widgets') == 'canvas':
+            # Вся сетка - один виджет с инструкциями canvas
+            from month_canvas import MonthCanvas
+            self.month_canvas = MonthCanvas(self.on_day_selected, self.on_day_long_press, size_hint_y=None)
+            scroll.add_widget(self.month_canvas)
+        else:
+            # Календарь
+            self.calendar_grid = GridLayout(
+                cols=7, 
+                spacing=dp(2), 
+                size_hint_y=None,
+                row_default_height=dp(70)  # Фиксированная высота строки
+            )
+            self.calendar_grid.bind(minimum_height=self.calendar_grid.setter('height'))
+            
+            # Пул ячеек 6x7 создается один раз и перенастраивается при навигации
+            for i in range(6 * 7):
+                btn = DayButton(
+                    date_str=None,
+                    day_num=0,
+                    is_current_month=False,
+                    size_hint_y=None,
+                    height=dp(70)
+                )
+                # Нажатие срабатывает при отпускании, чтобы отличить удержание
+                btn.bind(on_release=self.on_day_click)
+                btn.bind(on_long_press=lambda btn: self.on_day_long_press(btn.date_str))
+                self.day_cells.append(btn)
+                self.calendar_grid.add_widget(btn)
+            
+            scroll.add_widget(self.calendar_grid)
         
-        scroll = ScrollView(size_hint_y=0.75)
-        scroll.add_widget(self.calendar_grid)
         calendar_layout.add_widget(scroll)
         
         # Статус
@@ -128,19 +380,46 @@ class CalendarApp(App):
         )
         calendar_layout.add_widget(self.status_label)
         
-        # Кнопка сегодня
+        # Кнопка сегодня между отменой и повтором
+        today_bar = BoxLayout(size_hint_y=0.08, spacing=dp(5))
+        self.undo_btn = Button(text='Отменить', size_hint_x=0.3, font_size=dp(14), disabled=True)
+        self.undo_btn.bind(on_press=self.undo)
         today_btn = Button(
             text='Сегодня', 
-            size_hint_y=0.08,
+            size_hint_x=0.4,
             font_size=dp(16)
         )
         today_btn.bind(on_press=self.go_to_today)
-        calendar_layout.add_widget(today_btn)
+        self.redo_btn = Button(text='Повторить', size_hint_x=0.3, font_size=dp(14), disabled=True)
+        self.redo_btn.bind(on_press=self.redo)
+        today_bar.add_widget(self.undo_btn)
+        today_bar.add_widget(today_btn)
+        today_bar.add_widget(self.redo_btn)
+        calendar_layout.add_widget(today_bar)
+        
+        # Действия с выделенными днями; показываются вместо кнопок под сеткой
+        self.selection_bar = BoxLayout(size_hint_y=0.08, spacing=dp(5))
+        for text, handler in (('Цвет', self.on_selection_color),
+                              ('Очистить', self.on_selection_clear),
+                              ('Удалить', self.on_selection_delete),
+                              ('Отмена', self.cancel_selection)):
+            btn = Button(text=text, font_size=dp(14))
+            btn.bind(on_press=handler)
+            self.selection_bar.add_widget(btn)
+        self.calendar_layout = calendar_layout
+        self.today_bar = today_bar
         
         self.calendar_tab.content = calendar_layout
     
     def create_notes_tab(self):
         """Создает вкладку со всеми заметками"""
+        # Модули, не нужные для первого кадра, загружаются здесь
+        from kivy.uix.recycleview import RecycleView
+        from kivy.uix.recycleboxlayout import RecycleBoxLayout
+        from kivy.uix.textinput import TextInput
+        from kivy.uix.spinner import Spinner
+        import notes_widgets  # регистрирует NoteCard и NotesEmptyLabel в Factory
+
         # Основной layout
         notes_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(5))
         
@@ -171,18 +450,55 @@ class CalendarApp(App):
         
         notes_layout.add_widget(notes_control)
         
-        # Список заметок
-        self.notes_scroll = ScrollView(size_hint_y=0.8)
-        self.notes_container = BoxLayout(
+        # Поиск по тексту заметок
+        self.search_query = ''
+        self.search_input = TextInput(
+            multiline=False,
+            size_hint_y=0.07,
+            hint_text='Поиск по заметкам...',
+            font_size=dp(16)
+        )
+        # Запрос выполняется после паузы в наборе, а не на каждую букву
+        self.search_trigger = Clock.create_trigger(self.apply_search, 0.15)
+        self.search_input.bind(text=lambda instance, text: self.search_trigger())
+        notes_layout.add_widget(self.search_input)
+        
+        # Фильтры по цвету и диапазону дат
+        self.note_filter = (None, None, None)
+        filters = BoxLayout(size_hint_y=0.07, spacing=dp(10))
+        self.color_filter = Spinner(
+            text=ALL_COLORS,
+            values=[ALL_COLORS] + [color_name for hex_color_value, color_name in PALETTE],
+            font_size=dp(14)
+        )
+        self.color_filter.bind(text=self.on_color_filter)
+        self.date_filter = Spinner(text='Все даты', values=list(DATE_FILTER_OPTIONS), font_size=dp(14))
+        self.date_filter.bind(text=self.on_date_filter)
+        filters.add_widget(self.color_filter)
+        filters.add_widget(self.date_filter)
+        notes_layout.add_widget(filters)
+        
+        # Список заметок: видимыми являются только карточки в окне прокрутки
+        self.notes_view = RecycleView(size_hint_y=0.66, viewclass='NoteCard')
+        notes_layout_manager = RecycleBoxLayout(
             orientation='vertical',
             spacing=dp(5),
+            padding=[dp(5), dp(5), dp(5), dp(5)],
+            default_size=(None, dp(120)),
+            default_size_hint=(1, None),
             size_hint_y=None,
-            padding=[dp(5), dp(5), dp(5), dp(5)]
+            key_viewclass='viewclass'
         )
-        self.notes_container.bind(minimum_height=self.notes_container.setter('height'))
+        notes_layout_manager.bind(minimum_height=notes_layout_manager.setter('height'))
+        notes_layout_manager.bind(height=self.keep_notes_scroll)
         
-        self.notes_scroll.add_widget(self.notes_container)
-        notes_layout.add_widget(self.notes_scroll)
+        self.notes_view.add_widget(notes_layout_manager)
+        # Все найденные даты в порядке показа; карточки создаются постранично
+        self.notes_order = []
+        self.notes_rule_days = {}
+        self.notes_scroll_top = None
+        self.notes_view.bind(scroll_y=self.extend_notes_list)
+        notes_layout.add_widget(self.notes_view)
         
         # Статус заметок
         self.notes_status = Label(
@@ -193,122 +509,1008 @@ class CalendarApp(App):
         notes_layout.add_widget(self.notes_status)
         
         self.notes_tab.content = notes_layout
+        # Индексы поиска и фильтров строятся по кадрам, пока открыт список
+        self.ensure_search_index()
     
     def load_data(self):
-        """Загружает сохраненные данные"""
-        self.saved_data = {}
+        """Загружает сохраненные данные: сначала текущий месяц, остальное в фоне"""
+        # Начатое массовое изменение дописывается в прежнее хранилище
+        self.jobs.finish('apply')
+        self.jobs.cancel('prepare')
+        self.bulk_changes = None
+        self.store = self.create_store()
+        self.persistence = PersistenceWorker(
+            self.store,
+            on_error=lambda count, error: Clock.schedule_once(lambda dt: self.on_persist_error(count, error))
+        )
+        # Слияние данных предыдущего хранилища больше не нужно
+        self.jobs.cancel('load')
+        self.loading = False
+        gc.enable()
+        
+        if self.store.lazy:
+            # Для SQLite здесь только кэш уже запрошенных дней
+            self.saved_data = CompactDays(self.store.load())
+        else:
+            # Дни хранятся компактными записями; словари JSON - только на входе и выходе
+            self.saved_data = CompactDays(self.store.load_month(self.current_date.year, self.current_date.month))
+            self.loading = True
+            # Месяцы, уже прочитанные с диска целиком до конца загрузки
+            self.loaded_months = {(self.current_date.year, self.current_date.month)}
+            # Дни, измененные до конца загрузки, не перезаписываются данными с диска
+            self.load_overrides = set()
+            # Пока создаются записи всех дней, полные сборки мусора идут одна за
+            # другой и держат GIL десятки миллисекунд, останавливая кадры. Циклов
+            # загрузка не создает; сборка включается в finish_loading
+            gc.disable()
+            threading.Thread(target=self.load_remaining, args=(self.store,), daemon=True).start()
+        
+        # Вторичный индекс: отсортированные даты заметок (месяцы ищутся в CompactDays)
+        self.notes_index = NotesIndex()
+        self.notes_index.build(self.saved_data)
+        # Сводки месяцев для обзора года
+        self.month_stats = MonthStats()
+        
+        # Полнотекстовый индекс и индекс фильтров строятся при первом открытии заметок
+        self.jobs.cancel('search')
+        self.search_index = None
+        self.filter_index = None
+        
+        # Правила повторения хранятся отдельно и раскрываются по месяцам
+        self.recurrence = RecurrenceEngine('calendar_rules.json')
+        self.recurrence.load()
+    
+    def load_remaining(self, store):
+        """Фоновый поток: читает все данные и передает их в главный поток"""
         try:
-            if os.path.exists('calendar_data.json'):
-                with open('calendar_data.json', 'r', encoding='utf-8') as f:
-                    self.saved_data = json.load(f)
-        except:
-            self.saved_data = {}
+            data = store.load()
+        except (OSError, ValueError) as e:
+            Logger.error(f'Storage: ошибка фоновой загрузки: {e}')
+            data = {}
+        # Записи собираются здесь же, чтобы не занимать этим главный поток
+        items = [(date_str, DayRecord.from_dict(day_data)) for date_str, day_data in data.items()]
+        Clock.schedule_once(lambda dt: self.merge_loaded(store, items))
+    
+    def merge_loaded(self, store, items):
+        """Вливает загруженные дни порциями в бюджете кадра"""
+        if store is not self.store:
+            # Данные уже перезагружены
+            return
+        self.jobs.run('load', self.merge_steps(items),
+                      on_progress=self.notes_status_loading, on_done=self.finish_loading)
+    
+    def merge_steps(self, items):
+        """Шаги слияния загруженных дней"""
+        for start in range(0, len(items), LOAD_MERGE_STEP):
+            self.saved_data.update(
+                (date_str, day_data) for date_str, day_data in items[start:start + LOAD_MERGE_STEP]
+                if date_str not in self.load_overrides
+            )
+            yield min(start + LOAD_MERGE_STEP, len(items)), len(items)
+        yield from self.index_steps()
+    
+    def index_steps(self):
+        """Шаги построения индекса заметок по всем загруженным дням
+        
+        Новый индекс строится в стороне и подменяет старый в finish_loading;
+        дни, измененные за это время, есть в load_overrides и переиндексируются там.
+        Индексы поиска и фильтров строятся после загрузки отдельной операцией.
+        """
+        notes = []
+        done, total = 0, len(self.saved_data)
+        for chunk in self.saved_data.sorted_chunks(LOAD_MERGE_STEP):
+            notes.extend((date_str, day_data) for date_str, day_data in chunk if has_note(day_data))
+            done += len(chunk)
+            yield done, total
+        # Последняя порция (ключи не-даты) может нарушить порядок; на почти
+        # отсортированном списке сортировка линейна
+        notes.sort(key=lambda item: item[0])
+        notes_index = NotesIndex()
+        notes_index.dates = [date_str for date_str, day_data in notes]
+        self.loaded_index = notes_index
+    
+    def finish_loading(self):
+        """Подменяет индексы построенными и обновляет интерфейс после загрузки"""
+        self.notes_index = self.loaded_index
+        self.loaded_index = None
+        self.month_cache.clear()
+        self.month_stats.clear()
+        self.loading = False
+        # Дни, измененные во время построения индекса, могли попасть в него старыми
+        self.reindex_days(sorted(self.load_overrides))
+        Logger.info(f'Storage: загружено {len(self.saved_data)} дней')
+        # Загруженные записи живут до выхода: полная сборка мусора больше не
+        # обходит их (на 100 тысячах дней это около 100 мс за сборку)
+        gc.freeze()
+        gc.enable()
+        self.update_calendar()
+        if self.year_canvas is not None:
+            self.update_year_view()
+        if self.notes_view is not None:
+            self.update_notes_list()
+            self.ensure_search_index()
+    
+    def notes_status_loading(self, done, total):
+        """Показывает ход загрузки во вкладке заметок"""
+        if self.notes_view is not None:
+            self.notes_status.text = f"Загрузка заметок... {done * 100 // total}%"
+    
+    def ensure_search_index(self):
+        """Запускает построение индексов поиска и фильтров, если их еще нет"""
+        if self.search_index is None and not self.loading and not self.jobs.running('search'):
+            self.jobs.run('search', self.search_index_steps(),
+                          on_progress=self.notes_status_indexing, on_done=self.finish_search_index)
+    
+    def search_index_steps(self):
+        """Шаги построения индексов поиска и фильтров; для SQLite - по всем заметкам базы
+        
+        Дни, измененные за время построения, собираются в search_dirty и
+        переиндексируются в конце.
+        """
+        self.search_dirty = set()
+        search_index = NoteSearchIndex()
+        filter_index = NoteFilterIndex()
+        if self.store.lazy:
+            # Даты по возрастанию: списки индекса фильтров только дописываются
+            notes = list(reversed(self.iter_notes()))
+            total = len(notes)
+            yield
+        else:
+            dates = list(self.notes_index.dates)
+            notes = ((date_str, self.saved_data.get(date_str)) for date_str in dates)
+            total = len(dates)
+        
+        def documents():
+            for date_str, day_data in notes:
+                if day_data is not None and has_note(day_data):
+                    filter_index.set(date_str, day_data)
+                    yield date_str, day_data['note']
+        
+        for done in search_index.build_steps(documents(), NOTES_BUILD_STEP):
+            yield done, total
+        self.search_index = search_index
+        self.filter_index = filter_index
+        for date_str in sorted(self.search_dirty):
+            self.reindex_search(date_str)
+        self.search_dirty = None
+    
+    def finish_search_index(self):
+        """Показывает результаты поиска и фильтров, ждавшие индексов"""
+        if self.search_query or self.filter_active():
+            self.update_notes_list()
+    
+    def notes_status_indexing(self, done, total):
+        """Показывает ход построения индексов, пока их ждут поиск или фильтры"""
+        if self.search_query or self.filter_active():
+            self.notes_status.text = f"Загрузка заметок... {done * 100 // max(total, 1)}%"
+    
+    def build_config(self, config):
+        """Настройки приложения по умолчанию (секция [calendar])"""
+        config.setdefaults('calendar', {
+            'storage': 'json',
+            'grid_renderer': 'widgets',
+            'profiling': '0',
+            'profiling_overlay': '0',
+            'trace_file': 'calendar_trace.json',
+            'frame_budget_ms': '8',
+            'sync_url': '',
+            'undo_memory_kb': '8192'
+        })
+    
+    def setting(self, key, env_name, default):
+        """Значение настройки: переменная окружения, затем конфиг, затем default"""
+        if env_name in os.environ:
+            return os.environ[env_name]
+        if self.config is not None:
+            return self.config.getdefault('calendar', key, default)
+        return default
+    
+    def setting_enabled(self, key, env_name):
+        """Булева настройка (1/true/yes/on)"""
+        return str(self.setting(key, env_name, '0')).lower() in ('1', 'true', 'yes', 'on')
+    
+    def start_profiling(self):
+        """Включает замеры горячих путей, кадров и числа виджетов"""
+        self.profiler = Profiler()
+        # Обертки ставятся только при включенном профилировании
+        self.profiler.instrument(self, PROFILED_METHODS)
+        Clock.schedule_interval(self.profile_frame, 0)
+        Clock.schedule_interval(self.profile_widgets, 1)
+        if self.setting_enabled('profiling_overlay', 'CALENDAR_PROFILE_OVERLAY'):
+            Clock.schedule_once(self.create_profile_overlay)
+        Logger.info('Perf: профилирование включено')
+    
+    def profile_frame(self, dt):
+        """Записывает длительность кадра"""
+        now = self.profiler.now_us()
+        self.profiler.record('frame', now - dt * 1e6, dt * 1e6)
+    
+    def profile_widgets(self, dt):
+        """Записывает число живых виджетов в дереве окна"""
+        roots = Window.children if Window is not None else [self.tabs]
+        self.profiler.counter('widgets', sum(1 for root in roots for widget in root.walk(restrict=True)))
+    
+    def create_profile_overlay(self, dt):
+        """Полупрозрачная подпись с p50/p95 поверх интерфейса"""
+        if Window is None:
+            return
+        self.profile_overlay = Label(
+            size_hint=(None, None),
+            size=(dp(280), dp(150)),
+            font_size=dp(11),
+            halign='left',
+            valign='top',
+            color=(1, 0.3, 0.3, 1)
+        )
+        self.profile_overlay.text_size = self.profile_overlay.size
+        Window.add_widget(self.profile_overlay)
+        Clock.schedule_interval(self.update_profile_overlay, 0.5)
+    
+    def update_profile_overlay(self, dt):
+        """Обновляет текст оверлея"""
+        self.profile_overlay.pos = (Window.width - self.profile_overlay.width, Window.height - self.profile_overlay.height)
+        lines = [
+            f"{name}: p50 {stats['p50']:.1f} / p95 {stats['p95']:.1f} мс"
+            for name, stats in sorted(self.profiler.summary().items())
+        ]
+        lines.append(f"виджетов: {self.profiler.counters.get('widgets', 0)}")
+        self.profile_overlay.text = '\n'.join(lines)
+    
+    def dump_profile(self):
+        """Сохраняет трассу профилировщика, если он включен"""
+        if self.profiler is not None:
+            self.profiler.dump_trace(self.setting('trace_file', 'CALENDAR_TRACE', 'calendar_trace.json'))
+    
+    def create_store(self):
+        """Выбирает хранилище: json (по умолчанию) или sqlite"""
+        if self.setting('storage', 'CALENDAR_STORAGE', 'json') == 'sqlite':
+            store = SqliteStore('calendar_data.db')
+            store.import_json_once('calendar_data.json')
+            return store
+        # Снимок calendar_data.json + журнал изменений
+        return JournalStore('calendar_data.json')
+    
+    def get_month_data(self, year, month):
+        """Возвращает данные дней месяца"""
+        if self.store.lazy:
+            # Незаписанные дни берутся из памяти: в базе их версия устарела
+            unwritten = self.persistence.unwritten(f"{year:04d}-{month:02d}-")
+            month_data = self.store.month(year, month)
+            self.saved_data.update(
+                (date_str, day_data) for date_str, day_data in month_data.items() if date_str not in unwritten
+            )
+            for date_str, day_data in unwritten.items():
+                if day_data is None:
+                    month_data.pop(date_str, None)
+                else:
+                    month_data[date_str] = self.saved_data.get(date_str, day_data)
+            return month_data
+        if self.loading and (year, month) not in self.loaded_months:
+            # В памяти пока только часть дней: месяц дочитывается с диска,
+            # а дни, измененные за время загрузки, остаются как есть
+            self.loaded_months.add((year, month))
+            self.saved_data.update(
+                (date_str, day_data) for date_str, day_data in self.store.load_month(year, month).items()
+                if date_str not in self.load_overrides
+            )
+        return self.saved_data.month(year, month)
+    
+    def get_day(self, date_str):
+        """Возвращает данные дня"""
+        if self.loading:
+            # Месяц дня дочитывается с диска, если его еще нет в памяти
+            self.get_month_data(int(date_str[:4]), int(date_str[5:7]))
+        if date_str not in self.saved_data and self.store.lazy:
+            if date_str in self.persistence.unwritten(date_str):
+                # День удален, но удаление еще не записано в базу
+                return {}
+            day_data = self.store.get(date_str)
+            if day_data is not None:
+                self.saved_data[date_str] = day_data
+        return self.saved_data.get(date_str, {})
+    
+    def effective_day(self, date_str):
+        """Данные дня: конкретная запись или день, порожденный правилом"""
+        day_data = self.get_day(date_str)
+        if day_data:
+            return day_data
+        return self.recurrence.day(date_str) or {}
+    
+    def iter_notes(self):
+        """Возвращает пары (дата, данные) для дней с заметками, новые сначала"""
+        if self.store.lazy:
+            unwritten = self.persistence.unwritten()
+            notes = [(date_str, day_data) for date_str, day_data in self.store.notes() if date_str not in unwritten]
+            if not unwritten:
+                return notes
+            # Незаписанные дни подставляются из памяти
+            notes.extend(
+                (date_str, self.saved_data.get(date_str, day_data)) for date_str, day_data in unwritten.items()
+                if day_data is not None and has_note(day_data)
+            )
+            notes.sort(key=lambda item: item[0], reverse=True)
+            return notes
+        return [(date_str, self.saved_data[date_str]) for date_str in self.notes_index.newest_first()]
     
     def save_data(self):
-        """Сохраняет данные"""
-        try:
-            with open('calendar_data.json', 'w', encoding='utf-8') as f:
-                json.dump(self.saved_data, f, ensure_ascii=False, indent=2)
-        except:
-            pass
+        """Сохраняет данные целиком (пересобирает снимок)"""
+        self.jobs.finish('apply')
+        self.persistence.flush()
+        if self.loading:
+            # Неполные данные не должны заменить снимок
+            return
+        self.store.compact(self.saved_data)
+    
+    def commit_days(self, date_strs, remote=False):
+        """Обновляет индексы и сохраняет измененные дни
+        
+        remote=True - изменения пришли с сервера и не отправляются обратно.
+        """
+        self.store_days(date_strs, remote)
+        self.refresh_days(date_strs)
+    
+    def store_days(self, date_strs, remote=False, changed=None):
+        """Передает измененные дни записи и синхронизации
+        
+        changed - новые версии дней (None - удален), если они уже под рукой.
+        """
+        if self.loading:
+            self.load_overrides.update(date_strs)
+        if self.bulk_changes is not None:
+            # Массовое изменение не трогает дни, измененные после его начала
+            for date_str in date_strs:
+                self.bulk_changes.pop(date_str, None)
+        if self.sync is not None and not remote:
+            self.sync.mark_dirty(date_strs)
+        self.persist_days(date_strs, changed)
+    
+    def refresh_days(self, date_strs, noted=None):
+        """Обновляет индексы, кэш месяцев и интерфейс для измененных дней
+        
+        noted - те из дней, где после изменения есть заметка, если уже известны.
+        """
+        self.reindex_days(date_strs, noted)
+        # Kivy вызывает обработчики в обратном порядке привязки, поэтому кэш
+        # сбрасывается до события, а не в одном из обработчиков
+        self.invalidate_month_cache(date_strs)
+        self.dispatch('on_days_changed', date_strs)
+    
+    def on_days_changed(self, date_strs):
+        """Обработчик события по умолчанию"""
+        pass
+    
+    def reindex_days(self, date_strs, noted=None):
+        """Обновляет вторичные индексы для измененных дней"""
+        if len(date_strs) > BULK_REFRESH_THRESHOLD:
+            # Массовое изменение: индекс заметок пересобирается одним проходом,
+            # индексы поиска и фильтров строятся заново по кадрам
+            self.month_stats.clear()
+            if noted is None:
+                noted = [date_str for date_str in date_strs if has_note(self.saved_data.get(date_str) or {})]
+            self.notes_index.update(date_strs, noted)
+            if self.search_index is not None or self.jobs.running('search'):
+                self.jobs.cancel('search')
+                self.search_index = None
+                self.filter_index = None
+                if self.notes_view is not None:
+                    self.ensure_search_index()
+            return
+        self.month_stats.invalidate(date_strs)
+        for date_str in date_strs:
+            self.notes_index.set(date_str, self.saved_data.get(date_str) or {})
+            self.reindex_search(date_str)
+        if self.search_index is None and self.jobs.running('search'):
+            self.search_dirty.update(date_strs)
+    
+    def reindex_search(self, date_str):
+        """Обновляет день в индексах поиска и фильтров, если они построены"""
+        if self.search_index is None:
+            return
+        day_data = self.saved_data.get(date_str)
+        if day_data is not None:
+            self.search_index.set(date_str, day_data.get('note', ''))
+            self.filter_index.set(date_str, day_data)
+        else:
+            self.search_index.remove(date_str)
+            self.filter_index.remove(date_str)
+    
+    def persist_days(self, date_strs, changed=None):
+        """Передает измененные дни фоновой записи"""
+        # Записи неизменяемы: в словари JSON их превращает поток записи
+        if changed is None:
+            changed = {date_str: self.saved_data.get(date_str) for date_str in date_strs}
+        self.persistence.schedule(changed)
+        if not self.loading:
+            self.store.maybe_compact(self.saved_data)
+    
+    def on_persist_error(self, count, error):
+        """Сообщает, что изменения не записаны; они остаются в очереди записи"""
+        self.status_label.text = f"Не удалось сохранить дней: {count}, повтор позже ({error})"
+    
+    def date_range(self, start, end):
+        """Даты от start до end включительно (границы в любом порядке)"""
+        first, last = sorted((start, end))
+        day = datetime.strptime(first, '%Y-%m-%d').date()
+        last_day = datetime.strptime(last, '%Y-%m-%d').date()
+        date_strs = []
+        while day <= last_day:
+            date_strs.append(day.isoformat())
+            day += timedelta(days=1)
+        return date_strs
+    
+    def apply_days(self, changes, label):
+        """Записывает новые версии дней (None - удаление) одной операцией истории"""
+        self.write_days(changes, lambda days, size: self.record_history(label, days, size))
+    
+    def write_days(self, changes, on_done, modified=None):
+        """Применяет версии дней: небольшой пакет сразу, большой - по кадрам
+        
+        on_done(days, size) получает дата -> (до, после) и их объем для истории.
+        modified - время изменения (как у DayRecord.pack_modified), которое
+        получают все версии, например при отмене.
+        """
+        if len(changes) <= BULK_APPLY_STEP:
+            for progress in self.apply_steps(changes, on_done, modified):
+                pass
+            return
+        # Массовые изменения идут по одному, чтобы история сохранила их порядок
+        self.jobs.finish('apply')
+        self.bulk_changes = changes
+        self.jobs.run('apply', self.apply_steps(changes, on_done, modified), on_progress=self.status_applying)
+    
+    def apply_steps(self, changes, on_done, modified):
+        """Шаги изменения дней: данные меняются и передаются записи порциями
+        
+        Индексы и интерфейс обновляются один раз в конце. Дни, которые за это
+        время изменил пользователь, из changes убираются и уже не трогаются.
+        """
+        items = list(changes.items())
+        days = {}
+        noted = []
+        size = 0
+        for start in range(0, len(items), BULK_APPLY_STEP):
+            chunk = {date_str: day_data for date_str, day_data in items[start:start + BULK_APPLY_STEP]
+                     if date_str in changes}
+            if modified is not None:
+                # Возврат - тоже новое изменение: со старым last_modified синхронизация
+                # сочла бы его устаревшим и вернула бы версию сервера
+                chunk = {
+                    date_str: DayRecord.from_dict(day_data).edited(modified) if day_data is not None else None
+                    for date_str, day_data in chunk.items()
+                }
+            # В истории остаются сами записи, а не их копии
+            applied = self.saved_data.apply(chunk)
+            chunk_changed = {date_str: after for date_str, (before, after) in applied.items()}
+            self.store_days(list(applied), changed=chunk_changed)
+            days.update(applied)
+            noted.extend(date_str for date_str, after in chunk_changed.items() if after is not None and has_note(after))
+            size += versions_size(applied)
+            yield min(start + BULK_APPLY_STEP, len(items)), len(items)
+        if changes is self.bulk_changes:
+            self.bulk_changes = None
+        if days:
+            self.refresh_days(list(days), noted)
+        on_done(days, size)
+    
+    def status_applying(self, done, total):
+        """Показывает ход массового изменения"""
+        self.status_label.text = f"Изменение дней... {done * 100 // total}%"
+    
+    def record_history(self, label, days, size=None):
+        """Записывает операцию в историю отмены"""
+        if not days:
+            return
+        if not self.history.record(label, days, days_size=size):
+            # Прежние операции остаются в истории, эту отменить нельзя
+            Logger.warning(f'History: операция "{label}" не помещается в лимит отмены')
+            self.status_label.text = f"Операцию «{label}» нельзя отменить: она больше лимита истории"
+        self.update_history_buttons()
+    
+    def undoable(self, changes):
+        """Поместится ли пакет изменений в историю отмены"""
+        return self.history.fits({
+            date_str: (self.saved_data.get(date_str), day_data) for date_str, day_data in changes.items()
+        })
+    
+    def color_changes(self, date_strs, color):
+        """Новые версии дней с цветом color (только для дней другого цвета)"""
+        now = datetime.now().isoformat()
+        changes = {}
+        for date_str in date_strs:
+            day_data = self.get_day(date_str)
+            if day_data.get('color') != color:
+                changes[date_str] = {
+                    'color': color,
+                    'note': day_data.get('note', ''),
+                    'last_modified': now
+                }
+        return changes
+    
+    def delete_changes(self, date_strs):
+        """Удаления дней, у которых есть данные"""
+        return {date_str: None for date_str in date_strs if self.get_day(date_str)}
+    
+    def clear_notes_changes(self, date_strs):
+        """Новые версии дней без заметок (цвета остаются)"""
+        now = DayRecord.pack_modified(datetime.now().isoformat())
+        changes = {}
+        for date_str in date_strs:
+            day_data = self.get_day(date_str)
+            if has_note(day_data):
+                # Запись собирается сразу, без словаря и повторного разбора времени
+                changes[date_str] = DayRecord.from_dict(day_data).edited(now, note='')
+        return changes
+    
+    def confirm(self, text, on_yes, on_no=None):
+        """Спрашивает подтверждение во всплывающем окне"""
+        self.choose(text, [('Да', on_yes), ('Нет', on_no)], title='Подтверждение')
+    
+    def choose(self, text, choices, title='Выбор'):
+        """Предлагает варианты во всплывающем окне: пары (подпись, действие или None)
+        
+        Первый вариант - основное действие, он выделен цветом.
+        """
+        from kivy.uix.popup import Popup
+        
+        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        content.add_widget(Label(text=text, font_size=dp(16), halign='center'))
+        popup = Popup(title=title, content=content, size_hint=(0.8, 0.4), auto_dismiss=False)
+        
+        def answer(callback):
+            popup.dismiss()
+            if callback is not None:
+                callback()
+        
+        btn_layout = BoxLayout(size_hint_y=0.4, spacing=dp(10))
+        for index, (label, callback) in enumerate(choices):
+            btn = Button(text=label, font_size=dp(16))
+            if index == 0:
+                btn.background_color = (0.9, 0.3, 0.3, 1)
+            btn.bind(on_press=lambda btn, callback=callback: answer(callback))
+            btn_layout.add_widget(btn)
+        content.add_widget(btn_layout)
+        popup.open()
+    
+    def change_rule(self, rule_id, before, after, label):
+        """Записывает изменение правила повторения в историю"""
+        self.history.record(label, {}, {rule_id: (before, after)})
+        self.update_history_buttons()
+        self.on_rules_changed()
+    
+    def undo(self, instance=None):
+        """Отменяет последнюю операцию"""
+        # Незаконченная массовая операция сначала попадает в историю
+        self.jobs.finish('apply')
+        entry = self.history.undo()
+        if entry is None:
+            self.status_label.text = "Нечего отменять"
+            return
+        self.apply_history(entry, 0)
+        self.status_label.text = f"Отменено: {entry.label}"
+    
+    def redo(self, instance=None):
+        """Повторяет отмененную операцию"""
+        self.jobs.finish('apply')
+        entry = self.history.redo()
+        if entry is None:
+            self.status_label.text = "Нечего повторять"
+            return
+        self.apply_history(entry, 1)
+        self.status_label.text = f"Повторено: {entry.label}"
+    
+    def apply_history(self, entry, version):
+        """Возвращает даты и правила операции к версии 0 (до) или 1 (после)"""
+        now = DayRecord.pack_modified(datetime.now().isoformat())
+        self.write_days(
+            {date_str: versions[version] for date_str, versions in entry.days.items()},
+            lambda days, size: None, modified=now
+        )
+        for rule_id, versions in entry.rules.items():
+            self.recurrence.restore_rule(rule_id, versions[version])
+        if entry.rules:
+            self.on_rules_changed()
+        self.update_history_buttons()
+    
+    def update_history_buttons(self):
+        """Включает кнопки отмены и повтора по состоянию истории"""
+        self.undo_btn.disabled = not self.history.can_undo()
+        self.redo_btn.disabled = not self.history.can_redo()
+    
+    def setup_sync(self):
+        """Включает синхронизацию, если задан сервер (sync_url / CALENDAR_SYNC_URL)"""
+        self.sync = None
+        url = self.setting('sync_url', 'CALENDAR_SYNC_URL', '')
+        if not url:
+            return
+        from sync import SyncClient
+        self.sync = SyncClient(url)
+        Clock.schedule_once(self.start_sync, SYNC_START_DELAY)
+        Clock.schedule_interval(self.start_sync, SYNC_INTERVAL)
+    
+    def start_sync(self, dt=None):
+        """Передает измененные дни фоновому обмену с сервером"""
+        if self.sync is None or self.loading or self.sync.busy():
+            return
+        changes = self.sync.take_changes(lambda date_str: dict(self.get_day(date_str)))
+        self.sync.sync_in_background(
+            changes,
+            lambda incoming, cursor: Clock.schedule_once(lambda dt: self.apply_remote(incoming, cursor)),
+            lambda error: Logger.warning(f'Sync: {error}')
+        )
+    
+    def apply_remote(self, changes, cursor):
+        """Применяет дни с сервера; более новые локальные версии остаются
+        
+        Курсор сохраняется, только когда примененные дни записаны на диск.
+        """
+        from sync import is_newer
+        applied = []
+        for change in changes:
+            date_str = change['date']
+            local = self.get_day(date_str)
+            # Для неотправленного удаления время берется из отметки клиента
+            local_modified = local.get('last_modified') if local else self.sync.dirty.get(date_str)
+            if not is_newer(change, local_modified):
+                continue
+            if change['data'] is not None:
+                self.saved_data[date_str] = change['data']
+            elif date_str in self.saved_data:
+                del self.saved_data[date_str]
+            else:
+                continue
+            applied.append(date_str)
+        if applied:
+            self.commit_days(applied, remote=True)
+            self.status_label.text = f"Синхронизировано дней: {len(applied)}"
+        sync = self.sync
+        self.persistence.when_written(lambda: sync.commit_cursor(cursor))
     
     def get_month_text(self):
         """Возвращает название месяца"""
-        months = [
-            'Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
-            'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'
-        ]
-        return f"{months[self.current_date.month-1]} {self.current_date.year}"
+        return f"{MONTH_NAMES[self.current_date.month-1]} {self.current_date.year}"
     
     def update_calendar(self):
         """Обновляет отображение календаря"""
-        self.calendar_grid.clear_widgets()
+        created_before = DayButton.created
         
         year = self.current_date.year
         month = self.current_date.month
+        cells, rows = self.cached_month_cells(year, month)
+        if self.selected_days:
+            cells = [self.display_cell(cell) for cell in cells]
         
+        if self.month_canvas is not None:
+            self.month_canvas.set_cells(cells, rows)
+        else:
+            for index, (btn, cell) in enumerate(zip(self.day_cells, cells)):
+                # Строки за пределами месяца схлопываем, чтобы сетка не росла
+                btn.height = dp(70) if index // 7 < rows else 0
+                btn.assign(cell)
+        
+        # Замер: сколько виджетов создано за перерисовку (ожидается 0)
+        self.grid_allocations = DayButton.created - created_before
+        Logger.debug(f'Calendar: {year}-{month:02d} перерисован, создано виджетов: {self.grid_allocations}')
+        
+        # Соседние месяцы готовятся заранее, чтобы переход был мгновенным
+        self.prefetch_trigger()
+    
+    def cached_month_cells(self, year, month):
+        """Ячейки месяца из ограниченного LRU-кэша"""
+        today = datetime.now().date()
+        if self.month_cache_day != today:
+            # Подсветка "сегодня" устарела
+            self.month_cache.clear()
+            self.month_cache_day = today
+        key = (year, month)
+        entry = self.month_cache.get(key)
+        if entry is None:
+            entry = self.month_cache[key] = self.month_cells(year, month)
+            if len(self.month_cache) > MONTH_CACHE_SIZE:
+                self.month_cache.popitem(last=False)
+        else:
+            self.month_cache.move_to_end(key)
+        return entry
+    
+    def adjacent_months(self):
+        """Предыдущий и следующий месяц относительно текущего"""
+        year, month = self.current_date.year, self.current_date.month
+        prev_key = (year - 1, 12) if month == 1 else (year, month - 1)
+        next_key = (year + 1, 1) if month == 12 else (year, month + 1)
+        return prev_key, next_key
+    
+    def prefetch_adjacent(self, dt):
+        """Считает соседние месяцы и заранее растеризует их подписи"""
+        if self.loading:
+            # Без двоичной копии месяц дочитывался бы из JSON в главном потоке;
+            # finish_loading перерисует календарь, и подготовка запустится снова
+            return
+        for year, month in self.adjacent_months():
+            cells, rows = self.cached_month_cells(year, month)
+            for cell in cells:
+                if cell.date_str is not None:
+                    text_cache.get(cell.text, dp(18), cell.color, cell.bold)
+        # Текущий месяц остается самым свежим в кэше
+        self.month_cache.move_to_end((self.current_date.year, self.current_date.month))
+    
+    def invalidate_month_cache(self, date_strs):
+        """Сбрасывает закэшированные месяцы измененных дней"""
+        if len(date_strs) > BULK_REFRESH_THRESHOLD:
+            self.month_cache.clear()
+            return
+        for date_str in date_strs:
+            self.month_cache.pop((int(date_str[:4]), int(date_str[5:7])), None)
+    
+    def on_month_swipe(self, direction):
+        """Свайп: -1 - предыдущий месяц, 1 - следующий"""
+        if direction < 0:
+            self.prev_month(None)
+        else:
+            self.next_month(None)
+        # Месяц уже готов, остается короткое проявление
+        content = self.calendar_scroll.children[0]
+        content.opacity = 0.3
+        Animation(opacity=1, d=0.15).start(content)
+    
+    def month_cells(self, year, month):
+        """Возвращает 42 ячейки месяца (DayCell) и число занятых строк"""
         cal = calendar.monthcalendar(year, month)
+        month_data = self.merged_month_data(year, month)
+        today = datetime.now()
         
-        for week in cal:
-            for day in week:
-                if day == 0:
-                    # Пустая ячейка
-                    self.calendar_grid.add_widget(Label(text='', size_hint_y=None, height=dp(70)))
-                else:
-                    date_str = f"{year:04d}-{month:02d}-{day:02d}"
-                    
-                    # Создаем кнопку
-                    btn = DayButton(
-                        date_str=date_str,
-                        day_num=day,
-                        is_current_month=True,
-                        text=str(day),
-                        size_hint_y=None,
-                        height=dp(70)  # Фиксированная высота
-                    )
-                    
-                    # Проверяем есть ли заметка для этого дня
-                    has_note = False
-                    if date_str in self.saved_data:
-                        day_data = self.saved_data[date_str]
-                        
-                        # Устанавливаем цвет
-                        if 'color' in day_data:
-                            color = day_data['color']
-                            if isinstance(color, str) and color.startswith('#'):
-                                btn.background_color = get_color_from_hex(color)
-                            elif isinstance(color, list):
-                                btn.background_color = color
-                        
-                        # Проверяем есть ли заметка
-                        if 'note' in day_data and day_data['note'].strip():
-                            has_note = True
-                            btn.text = f"{day} 📝"
-                    
-                    # Подсветка сегодняшнего дня
-                    today = datetime.now()
-                    if year == today.year and month == today.month and day == today.day:
-                        # Если день не имеет цвета, подсвечиваем его
-                        if date_str not in self.saved_data or 'color' not in self.saved_data[date_str]:
-                            btn.background_color = (0.8, 0.9, 1, 1)
-                        btn.bold = True
-                        btn.color = (0, 0.3, 0.8, 1)
-                    
-                    # Для темных цветов делаем текст белым
-                    if isinstance(btn.background_color, (list, tuple)) and len(btn.background_color) >= 3:
-                        r, g, b = btn.background_color[0], btn.background_color[1], btn.background_color[2]
-                        brightness = 0.299 * r + 0.587 * g + 0.114 * b
-                        if brightness < 0.5:
-                            btn.color = (1, 1, 1, 1)
-                    
-                    btn.bind(on_press=self.on_day_click)
-                    self.calendar_grid.add_widget(btn)
+        cells = []
+        for index in range(6 * 7):
+            row, col = divmod(index, 7)
+            day = cal[row][col] if row < len(cal) else 0
+            
+            if day == 0:
+                # Пустая ячейка
+                cells.append(DayCell(None, 0, '', (1, 1, 1, 1), (0, 0, 0, 1), False))
+                continue
+            
+            date_str = f"{year:04d}-{month:02d}-{day:02d}"
+            cells.append(self.day_cell(date_str, day, month_data.get(date_str), today))
+        
+        return cells, len(cal)
+    
+    def merged_month_data(self, year, month):
+        """Дни месяца вместе с днями по правилам; конкретные записи их перекрывают"""
+        rule_data = self.recurrence.month(year, month)
+        month_data = self.get_month_data(year, month)
+        if not rule_data:
+            return month_data
+        merged = dict(rule_data)
+        merged.update(month_data)
+        return merged
+    
+    def day_cell(self, date_str, day, day_data, today):
+        """Оформление одной ячейки дня"""
+        text = str(day)
+        background = (1, 1, 1, 1)
+        color = (0, 0, 0, 1)
+        bold = False
+        
+        # Проверяем есть ли заметка для этого дня
+        if day_data is not None:
+            # Устанавливаем цвет
+            if 'color' in day_data:
+                day_color = day_data['color']
+                if isinstance(day_color, str) and day_color.startswith('#'):
+                    background = parse_color(day_color)
+                elif isinstance(day_color, list):
+                    background = day_color
+            
+            # Проверяем есть ли заметка
+            if 'note' in day_data and day_data['note'].strip():
+                text = f"{day} 📝"
+        
+        # Подсветка сегодняшнего дня
+        if date_str == today.strftime('%Y-%m-%d'):
+            # Если день не имеет цвета, подсвечиваем его
+            if day_data is None or 'color' not in day_data:
+                background = (0.8, 0.9, 1, 1)
+            bold = True
+            color = (0, 0.3, 0.8, 1)
+        
+        # Для темных цветов делаем текст белым
+        if len(background) >= 3:
+            r, g, b = background[0], background[1], background[2]
+            brightness = 0.299 * r + 0.587 * g + 0.114 * b
+            if brightness < 0.5:
+                color = (1, 1, 1, 1)
+        
+        return DayCell(date_str, day, text, background, color, bold)
+    
+    def refresh_changed_cells(self, app, date_strs):
+        """Перерисовывает только измененные ячейки видимого месяца"""
+        if len(date_strs) > BULK_REFRESH_THRESHOLD:
+            self.update_calendar()
+            return
+        year = self.current_date.year
+        month = self.current_date.month
+        # Индекс ячейки: смещение первого дня недели + номер дня
+        first_weekday = calendar.monthrange(year, month)[0]
+        today = datetime.now()
+        for date_str in date_strs:
+            if date_str[:7] != f"{year:04d}-{month:02d}":
+                continue
+            day = int(date_str[8:10])
+            index = first_weekday + day - 1
+            day_data = self.saved_data.get(date_str) or self.recurrence.day(date_str)
+            cell = self.display_cell(self.day_cell(date_str, day, day_data, today))
+            if self.month_canvas is not None:
+                self.month_canvas.set_cell(index, cell)
+            else:
+                self.day_cells[index].assign(cell)
+    
+    def display_cell(self, cell):
+        """Ячейка с учетом выделения"""
+        if cell.date_str in self.selected_days:
+            return cell._replace(background=SELECTION_BACKGROUND, color=(1, 1, 1, 1), bold=True)
+        return cell
     
     def on_day_click(self, instance):
         """Обработка клика по дню"""
-        if not instance.is_current_month:
+        if not instance.is_current_month or instance.long_pressed:
             return
         
-        self.selected_day = instance.date_str
+        self.on_day_selected(instance.date_str)
+    
+    def on_day_selected(self, date_str):
+        """Открывает редактор выбранного дня; в режиме выделения - отмечает день"""
+        if self.selected_days:
+            self.selected_days ^= {date_str}
+            if not self.selected_days:
+                self.end_selection()
+            self.refresh_selection([date_str])
+            return
+        self.selected_day = date_str
         self.show_day_editor()
     
+    def on_day_long_press(self, date_str):
+        """Долгое нажатие: начинает выделение или добавляет диапазон от первого дня"""
+        if not self.selected_days:
+            self.selection_anchor = date_str
+            self.show_selection_bar(True)
+            changed = [date_str]
+        else:
+            changed = [d for d in self.date_range(self.selection_anchor, date_str) if d not in self.selected_days]
+        self.selected_days.update(changed)
+        self.refresh_selection(changed)
+    
+    def refresh_selection(self, date_strs):
+        """Перерисовывает ячейки, у которых изменилось выделение"""
+        self.refresh_changed_cells(self, date_strs)
+        if self.selected_days:
+            self.status_label.text = f"Выбрано дней: {len(self.selected_days)}"
+    
+    def show_selection_bar(self, visible):
+        """Меняет кнопки под сеткой на панель действий с выделением и обратно"""
+        old, new = (self.today_bar, self.selection_bar) if visible else (self.selection_bar, self.today_bar)
+        if old.parent is not None:
+            self.calendar_layout.remove_widget(old)
+            self.calendar_layout.add_widget(new)
+    
+    def end_selection(self):
+        """Снимает выделение и возвращает выделенные даты"""
+        date_strs = sorted(self.selected_days)
+        self.selected_days = set()
+        self.selection_anchor = None
+        self.show_selection_bar(False)
+        return date_strs
+    
+    def cancel_selection(self, instance):
+        """Отменяет выделение"""
+        self.refresh_selection(self.end_selection())
+        self.status_label.text = 'Выделение снято'
+    
+    def run_selection_action(self, make_changes, label, message):
+        """Применяет пакетную операцию к выделенным дням
+        
+        make_changes(даты) возвращает новые версии дней. Операцию, которую
+        история не сможет отменить, пользователь подтверждает отдельно.
+        """
+        if self.loading:
+            self.status_label.text = "Дождитесь окончания загрузки данных"
+            return
+        date_strs = self.end_selection()
+        changes = make_changes(date_strs)
+        
+        def run():
+            self.apply_days(changes, label)
+            # Неизмененные дни перерисовываются только чтобы снять выделение
+            unchanged = sorted(set(date_strs).difference(changes))
+            if unchanged:
+                self.refresh_selection(unchanged)
+            if not self.jobs.running('apply'):
+                self.status_label.text = f"{message}: {len(changes)}"
+        
+        if self.undoable(changes):
+            run()
+            return
+        self.confirm(
+            f"Операцию «{label}» для {len(changes)} дней\nнельзя будет отменить. Продолжить?",
+            run, lambda: self.refresh_selection(date_strs)
+        )
+    
+    def on_selection_color(self, instance):
+        """Выбор цвета для выделенных дней"""
+        from kivy.uix.popup import Popup
+        
+        colors_grid = GridLayout(cols=5, spacing=dp(5), padding=dp(10))
+        popup = Popup(title='Цвет выделенных дней', content=colors_grid, size_hint=(0.9, 0.5))
+        
+        def choose(btn):
+            popup.dismiss()
+            self.run_selection_action(lambda date_strs: self.color_changes(date_strs, btn.hex_color),
+                                      'цвет дней', "Цвет задан, дней")
+        
+        for hex_color_value, color_name in PALETTE:
+            color_btn = Button(background_normal='', background_color=parse_color(hex_color_value))
+            color_btn.hex_color = hex_color_value
+            color_btn.bind(on_press=choose)
+            colors_grid.add_widget(color_btn)
+        popup.open()
+    
+    def on_selection_clear(self, instance):
+        """Очищает заметки выделенных дней"""
+        self.run_selection_action(self.clear_notes_changes, 'очистка заметок', "Заметки очищены, дней")
+    
+    def on_selection_delete(self, instance):
+        """Удаляет данные выделенных дней"""
+        self.run_selection_action(self.delete_changes, 'удаление дней', "Удалено дней")
+    
     def show_day_editor(self):
         """Показывает редактор дня"""
-        # Получаем данные дня
-        day_data = self.saved_data.get(self.selected_day, {})
+        if self.day_editor_popup is None:
+            self.build_day_editor()
+        
+        # Получаем данные дня (или повтора, если записи нет)
+        day_data = self.effective_day(self.selected_day)
         current_color = day_data.get('color', [1, 1, 1, 1])
         current_note = day_data.get('note', '')
         
         # Конвертируем цвет в HEX
         hex_color = self.color_to_hex(current_color)
         
+        # Заголовок
+        day_str = f"{self.selected_day[8:10]}.{self.selected_day[5:7]}.{self.selected_day[:4]}"
+        self.day_editor_title.text = f"День: {day_str}"
+        if 'rule' in day_data:
+            self.day_editor_title.text += " 🔁"
+        self.repeat_spinner.text = 'Не повторять'
+        self.on_repeat_select(self.repeat_spinner, self.repeat_spinner.text)
+        # Еженедельный повтор по умолчанию - в день недели выбранной даты
+        weekday = datetime.strptime(self.selected_day, '%Y-%m-%d').weekday()
+        for index, weekday_btn in enumerate(self.weekday_buttons):
+            weekday_btn.state = 'down' if index == weekday else 'normal'
+        
+        # Выделяем текущий цвет
+        if self.selected_color_btn is not None:
+            self.selected_color_btn.border = (0, 0, 0, 0)
+        self.selected_color_btn = self.color_buttons.get(hex_color.upper())
+        if self.selected_color_btn is not None:
+            self.selected_color_btn.border = (dp(2), dp(2), dp(2), dp(2))
+        
+        self.note_input.text = current_note
+        
+        # Сохраняем выбранный цвет
+        self.selected_color = hex_color
+        
+        self.day_editor_popup.open()
+    
+    def build_day_editor(self):
+        """Создает редактор дня один раз; дальше он только перенастраивается"""
+        from kivy.uix.popup import Popup
+        from kivy.uix.spinner import Spinner
+        from kivy.uix.textinput import TextInput
+        from kivy.uix.togglebutton import ToggleButton
+        
         # Создаем контент попапа
         content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(20))
         
         # Заголовок
-        day_str = f"{self.selected_day[8:10]}.{self.selected_day[5:7]}.{self.selected_day[:4]}"
-        title = Label(text=f"День: {day_str}", font_size=dp(20), bold=True)
-        content.add_widget(title)
+        self.day_editor_title = Label(font_size=dp(20), bold=True)
+        content.add_widget(self.day_editor_title)
         
         # Цвета
         color_label = Label(text="Выберите цвет:", font_size=dp(16))
@@ -317,48 +1519,21 @@ class CalendarApp(App):
         # Сетка цветов
         colors_grid = GridLayout(cols=5, spacing=dp(5), size_hint_y=None, height=dp(180))
         
-        colors = [
-            ('#FF6B6B', 'Красный'),
-            ('#FFD166', 'Желтый'),
-            ('#06D6A0', 'Зеленый'),
-            ('#118AB2', 'Синий'),
-            ('#9B59B6', 'Фиолетовый'),
-            ('#FF9A76', 'Оранжевый'),
-            ('#A7E9AF', 'Салатовый'),
-            ('#78C1D5', 'Голубой'),
-            ('#D4A5A5', 'Бежевый'),
-            ('#FFFFFF', 'Белый'),
-            ('#E74C3C', 'Темно-красный'),
-            ('#2ECC71', 'Ярко-зеленый'),
-            ('#3498DB', 'Небесно-синий'),
-            ('#F1C40F', 'Золотой'),
-            ('#1ABC9C', 'Бирюзовый'),
-            ('#34495E', 'Темно-серый'),
-            ('#ECF0F1', 'Светло-серый'),
-            ('#BDC3C7', 'Серый'),
-            ('#7F8C8D', 'Стальной'),
-            ('#2C3E50', 'Чернильный')
-        ]
-        
+        self.color_buttons = {}
         self.selected_color_btn = None
         
-        for hex_color_value, color_name in colors:
+        for hex_color_value, color_name in PALETTE:
             color_btn = Button(
                 background_normal='',
-                background_color=get_color_from_hex(hex_color_value),
+                background_color=parse_color(hex_color_value),
                 size_hint_y=None,
                 height=dp(40)
             )
             color_btn.hex_color = hex_color_value
             color_btn.color_name = color_name
-            
-            # Выделяем текущий цвет
-            if hex_color_value == hex_color:
-                self.selected_color_btn = color_btn
-                color_btn.border = (dp(2), dp(2), dp(2), dp(2))
-            
             color_btn.bind(on_press=self.on_color_select)
             colors_grid.add_widget(color_btn)
+            self.color_buttons[hex_color_value] = color_btn
         
         content.add_widget(colors_grid)
         
@@ -367,7 +1542,6 @@ class CalendarApp(App):
         content.add_widget(note_label)
         
         self.note_input = TextInput(
-            text=current_note,
             multiline=True,
             size_hint_y=None,
             height=dp(120),
@@ -376,6 +1550,27 @@ class CalendarApp(App):
         )
         content.add_widget(self.note_input)
         
+        # Повтор: сохраняет правило вместо записи одного дня
+        repeat_layout = BoxLayout(size_hint_y=None, height=dp(44), spacing=dp(10))
+        repeat_layout.add_widget(Label(text="Повтор:", font_size=dp(16), size_hint_x=0.35))
+        self.repeat_spinner = Spinner(
+            text='Не повторять',
+            values=list(REPEAT_OPTIONS),
+            font_size=dp(16)
+        )
+        repeat_layout.add_widget(self.repeat_spinner)
+        content.add_widget(repeat_layout)
+        
+        # Дни недели еженедельного повтора; для других частот недоступны
+        weekdays_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(4))
+        self.weekday_buttons = []
+        for name in WEEKDAY_NAMES:
+            weekday_btn = ToggleButton(text=name, font_size=dp(14))
+            weekdays_layout.add_widget(weekday_btn)
+            self.weekday_buttons.append(weekday_btn)
+        content.add_widget(weekdays_layout)
+        self.repeat_spinner.bind(text=self.on_repeat_select)
+        
         # Кнопки
         buttons_layout = BoxLayout(size_hint_y=None, height=dp(60), spacing=dp(10))
         
@@ -409,11 +1604,12 @@ class CalendarApp(App):
             size_hint=(0.9, 0.85),
             auto_dismiss=False
         )
-        
-        # Сохраняем выбранный цвет
-        self.selected_color = hex_color
-        
-        self.day_editor_popup.open()
+    
+    def on_repeat_select(self, spinner, text):
+        """Дни недели выбираются только для еженедельного повтора"""
+        weekly = REPEAT_OPTIONS[text] == 'weekly'
+        for weekday_btn in self.weekday_buttons:
+            weekday_btn.disabled = not weekly
     
     def on_color_select(self, instance):
         """Обработка выбора цвета"""
@@ -427,26 +1623,22 @@ class CalendarApp(App):
     def save_day_data(self, instance):
         """Сохраняет данные дня"""
         # Получаем цвет
-        color = get_color_from_hex(self.selected_color)
+        color = parse_color(self.selected_color)
         
         # Получаем заметку
         note = self.note_input.text.strip()
         
-        # Сохраняем данные
-        self.saved_data[self.selected_day] = {
+        freq = REPEAT_OPTIONS[self.repeat_spinner.text]
+        if freq is not None:
+            self.save_day_rule(freq, self.color_to_hex(color), note)
+            return
+        
+        # Сохраняем данные; календарь и список обновятся по событию
+        self.apply_days({self.selected_day: {
             'color': self.color_to_hex(color),
             'note': note,
             'last_modified': datetime.now().isoformat()
-        }
-        
-        # Сохраняем в файл
-        self.save_data()
-        
-        # Обновляем календарь
-        self.update_calendar()
-        
-        # Обновляем список заметок
-        self.update_notes_list()
+        }}, 'сохранение дня')
         
         # Закрываем попап
         self.day_editor_popup.dismiss()
@@ -460,16 +1652,138 @@ class CalendarApp(App):
     
     def delete_day_data(self, instance):
         """Удаляет данные дня"""
-        if self.selected_day in self.saved_data:
-            del self.saved_data[self.selected_day]
-            self.save_data()
-            self.update_calendar()
-            self.update_notes_list()
-        
+        date_str = self.selected_day
+        day_str = f"{date_str[8:10]}.{date_str[5:7]}.{date_str[:4]}"
+        rule_day = self.recurrence.day(date_str)
+        self.day_editor_popup.dismiss()
+        if date_str in self.saved_data:
+            # Конкретная запись; повтор (если есть) снова станет виден
+            self.apply_days({date_str: None}, 'удаление дня')
+            self.status_label.text = f"Данные дня {day_str} удалены"
+        elif rule_day is not None:
+            # День порожден правилом: убрать только его или весь повтор
+            rule_id = rule_day['rule']
+            self.choose(f"День {day_str} создан повтором.\nУдалить только этот день или весь повтор?", [
+                ('Только этот день', lambda: self.delete_occurrence(rule_id, date_str)),
+                ('Весь повтор', lambda: self.delete_rule(rule_id)),
+                ('Отмена', None)
+            ])
+        else:
+            self.status_label.text = f"Данные дня {day_str} удалены"
+    
+    def delete_occurrence(self, rule_id, date_str):
+        """Исключает из повтора одну дату; остальные дни правила остаются"""
+        versions = self.recurrence.exclude_date(rule_id, date_str)
+        if versions is not None:
+            self.change_rule(rule_id, *versions, 'удаление дня повтора')
+        self.status_label.text = f"День {date_str[8:10]}.{date_str[5:7]}.{date_str[:4]} убран из повтора"
+    
+    def delete_rule(self, rule_id):
+        """Удаляет правило повторения целиком"""
+        rule = self.recurrence.remove_rule(rule_id)
+        if rule is not None:
+            self.change_rule(rule_id, rule, None, 'удаление повтора')
+        self.status_label.text = "Повтор удален"
+    
+    def save_day_rule(self, freq, color, note):
+        """Сохраняет правило повторения, начиная с выбранного дня"""
+        weekdays = None
+        description = self.repeat_spinner.text.lower()
+        if freq == 'weekly':
+            start = datetime.strptime(self.selected_day, '%Y-%m-%d')
+            weekdays = [index for index, weekday_btn in enumerate(self.weekday_buttons) if weekday_btn.state == 'down']
+            weekdays = weekdays or [start.weekday()]
+            description += f" ({', '.join(WEEKDAY_NAMES[weekday] for weekday in weekdays)})"
+        rule = self.recurrence.add_rule(freq, self.selected_day, color, note, weekdays=weekdays)
+        self.change_rule(rule['id'], None, rule, 'добавление повтора')
         self.day_editor_popup.dismiss()
+        self.status_label.text = f"Повтор сохранен: {description}"
+    
+    def on_rules_changed(self):
+        """Перерисовывает календарь и заметки после изменения правил"""
+        self.month_cache.clear()
+        self.month_stats.clear()
+        self.update_calendar()
+        self.update_notes_list()
+        if self.year_canvas is not None:
+            self.update_year_view()
+    
+    def create_year_tab(self):
+        """Создает вкладку обзора года"""
+        from year_canvas import YearCanvas
         
-        day_str = f"{self.selected_day[8:10]}.{self.selected_day[5:7]}.{self.selected_day[:4]}"
-        self.status_label.text = f"Данные дня {day_str} удалены"
+        layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(5))
+        
+        control_panel = BoxLayout(size_hint_y=0.08, spacing=dp(10))
+        prev_btn = Button(text="<", size_hint_x=0.2, font_size=dp(20))
+        prev_btn.bind(on_press=lambda btn: self.show_year(self.year_shown - 1))
+        self.year_label = Label(font_size=dp(22), bold=True, size_hint_x=0.6)
+        next_btn = Button(text=">", size_hint_x=0.2, font_size=dp(20))
+        next_btn.bind(on_press=lambda btn: self.show_year(self.year_shown + 1))
+        control_panel.add_widget(prev_btn)
+        control_panel.add_widget(self.year_label)
+        control_panel.add_widget(next_btn)
+        layout.add_widget(control_panel)
+        
+        # 12 мини-месяцев рисуются инструкциями одного виджета
+        self.year_canvas = YearCanvas(self.on_year_month_press, size_hint_y=0.84)
+        layout.add_widget(self.year_canvas)
+        
+        self.year_status = Label(size_hint_y=0.08, font_size=dp(14))
+        layout.add_widget(self.year_status)
+        
+        self.year_shown = self.current_date.year
+        self.year_tab.content = layout
+    
+    def update_year_view(self):
+        """Перерисовывает обзор года по сводкам месяцев"""
+        from year_canvas import YearCanvas, YearMonth
+        
+        year = self.year_shown
+        months = []
+        colored = notes = 0
+        for month in range(1, 13):
+            first_weekday, days_in_month = calendar.monthrange(year, month)
+            summary = self.month_stats.month(year, month, self.merged_month_data, days_in_month)
+            colored += summary.colored
+            notes += summary.notes
+            # Полоса: самые частые цвета месяца в долях от дней с цветом
+            bar = [
+                (self.color_rgba(color), count / summary.colored)
+                for color, count in summary.colors.most_common(YearCanvas.BAR_SEGMENTS)
+            ]
+            months.append(YearMonth(
+                f"{MONTH_NAMES[month - 1][:3]} {summary.colored}/{summary.notes}",
+                first_weekday,
+                [self.color_rgba(color) if color is not None else None for color in summary.day_colors],
+                bar
+            ))
+        self.year_canvas.set_months(year, months)
+        self.year_label.text = str(year)
+        self.year_status.text = f"Дней с цветом / с заметками: {colored} / {notes}"
+    
+    def show_year(self, year):
+        """Переключает обзор на другой год"""
+        self.year_shown = year
+        self.update_year_view()
+    
+    def refresh_year_view(self, app, date_strs):
+        """Перерисовывает обзор, если изменились дни показанного года"""
+        if self.year_canvas is None:
+            return
+        year = f"{self.year_shown:04d}"
+        if any(date_str[:4] == year for date_str in date_strs):
+            self.update_year_view()
+    
+    def on_year_month_press(self, year, month):
+        """Открывает выбранный месяц в календаре"""
+        self.go_to_date(SimpleNamespace(date_str=f"{year:04d}-{month:02d}-01"))
+    
+    def color_rgba(self, color):
+        """Цвет дня (HEX или список) в rgba"""
+        if isinstance(color, str):
+            return parse_color(color)
+        return tuple(color)
     
     def color_to_hex(self, color):
         """Конвертирует цвет в HEX"""
@@ -510,163 +1824,345 @@ class CalendarApp(App):
     def refresh_notes(self, instance):
         """Обновляет список заметок"""
         self.update_notes_list()
-        self.notes_status.text = "Список заметок обновлен"
+        if not self.loading:
+            self.notes_status.text = "Список заметок обновлен"
     
     def clear_all_notes(self, instance):
         """Очищает все заметки (только текст заметок, цвета остаются)"""
-        confirm_popup = Popup(
-            title='Подтверждение',
-            size_hint=(0.7, 0.4)
-        )
-        
-        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
-        
-        msg = Label(
-            text="Удалить текст всех заметок?\nЦвета дней останутся.",
-            font_size=dp(16)
-        )
-        content.add_widget(msg)
-        
-        btn_layout = BoxLayout(size_hint_y=0.4, spacing=dp(10))
-        
-        yes_btn = Button(
-            text='Да', 
-            background_color=(0.9, 0.3, 0.3, 1),
-            font_size=dp(16)
-        )
-        no_btn = Button(text='Нет', font_size=dp(16))
-        
-        def clear_notes(btn):
-            for date_str in self.saved_data:
-                if 'note' in self.saved_data[date_str]:
-                    self.saved_data[date_str]['note'] = ''
-            self.save_data()
-            self.update_calendar()
-            self.update_notes_list()
-            confirm_popup.dismiss()
+        if self.loading:
+            self.notes_status.text = "Дождитесь окончания загрузки заметок"
+            return
+        # Новые версии дней собираются по кадрам, потом спрашивается подтверждение
+        self.jobs.finish('apply')
+        self.jobs.run('prepare', self.clear_notes_steps(), on_progress=self.notes_status_preparing)
+    
+    def clear_notes_steps(self):
+        """Шаги подготовки очистки всех заметок"""
+        if self.store.lazy:
+            notes = self.iter_notes()
+            dates = [date_str for date_str, day_data in notes]
+            yield
+        else:
+            dates = self.notes_index.dates[:]
+        # Дни, измененные до подтверждения, очистка уже не тронет
+        changes = self.bulk_changes = {}
+        size = 0
+        for start in range(0, len(dates), BULK_APPLY_STEP):
+            if self.store.lazy:
+                # Для SQLite заметки попадают в кэш, чтобы не читать их повторно
+                self.saved_data.update(notes[start:start + BULK_APPLY_STEP])
+            chunk = self.clear_notes_changes(dates[start:start + BULK_APPLY_STEP])
+            changes.update(chunk)
+            size += versions_size({date_str: (self.saved_data.get(date_str), day_data)
+                                   for date_str, day_data in chunk.items()})
+            yield min(start + BULK_APPLY_STEP, len(dates)), len(dates)
+        
+        text = "Удалить текст всех заметок?\nЦвета дней останутся."
+        if not self.history.fits(changes, days_size=size):
+            text += f"\n\nЗаметок {len(changes)} - больше лимита истории,\nотменить очистку будет нельзя."
+        
+        def clear_notes():
+            self.apply_days(changes, 'очистка заметок')
             self.notes_status.text = "Все заметки очищены"
         
-        yes_btn.bind(on_press=clear_notes)
-        no_btn.bind(on_press=confirm_popup.dismiss)
-        
-        btn_layout.add_widget(yes_btn)
-        btn_layout.add_widget(no_btn)
-        content.add_widget(btn_layout)
+        def cancel():
+            if self.bulk_changes is changes:
+                self.bulk_changes = None
         
-        confirm_popup.content = content
-        confirm_popup.open()
+        self.confirm(text, clear_notes, cancel)
+    
+    def notes_status_preparing(self, done, total):
+        """Показывает ход подготовки очистки"""
+        self.notes_status.text = f"Подготовка очистки... {done * 100 // total}%"
     
     def update_notes_list(self):
         """Обновляет список всех заметок во вкладке"""
-        # Очищаем контейнер
-        self.notes_container.clear_widgets()
-        
-        # Собираем заметки
-        notes_with_dates = []
-        for date_str, day_data in self.saved_data.items():
-            if 'note' in day_data and day_data['note'].strip():
-                note_text = day_data['note'].strip()
-                day_formatted = f"{date_str[8:10]}.{date_str[5:7]}.{date_str[:4]}"
-                
-                # Получаем цвет дня
-                color_hex = day_data.get('color', '#FFFFFF')
-                notes_with_dates.append((day_formatted, note_text, color_hex))
+        if self.notes_view is None:
+            # Вкладка еще не открывалась и будет построена с нуля
+            return
         
-        # Сортируем по дате
-        notes_with_dates.sort(key=lambda x: x[0], reverse=True)
+        if self.loading:
+            # Неполный список не показываем как окончательный
+            self.jobs.cancel('notes')
+            self.show_notes_message('Загрузка заметок...')
+            self.notes_title.text = 'Все заметки'
+            self.notes_status.text = 'Загрузка заметок...'
+            return
         
-        if not notes_with_dates:
+        # Новый запрос отменяет еще не законченный старый
+        self.jobs.run('notes', self.notes_list_steps())
+    
+    def notes_list_steps(self):
+        """Шаги построения списка заметок: порядок всех дат и первая страница карточек"""
+        if (self.search_query or self.filter_active()) and self.search_index is None:
+            # Список обновится, когда индексы поиска и фильтров будут готовы
+            self.show_notes_message('Загрузка заметок...')
+            self.notes_status.text = 'Загрузка заметок...'
+            self.ensure_search_index()
+            return
+        # Собираем даты заметок: все, отфильтрованные или найденные по запросу
+        rule_days = {}
+        if self.search_query:
+            # Все найденные даты: карточки все равно строятся постранично
+            order = self.search_index.search(self.search_query)
+            if self.filter_active():
+                order = [date_str for date_str in order if self.filter_index.matches(date_str, *self.note_filter)]
+        else:
+            if self.filter_active():
+                # Пересечение цвета и диапазона - срез отсортированного списка цвета
+                dates = self.filter_index.query(*self.note_filter)
+            elif self.store.lazy:
+                dates = [date_str for date_str, day_data in reversed(self.iter_notes())]
+            else:
+                dates = self.notes_index.dates
+            order = dates[::-1]
+            yield
+            rule_days = self.rule_notes()
+            for date_str in rule_days:
+                order.insert(self.order_position(order, date_str), date_str)
+        yield
+        
+        self.notes_order = order
+        self.notes_rule_days = rule_days
+        if not order and self.search_query:
+            self.show_notes_message(f"По запросу «{self.search_query}» ничего не найдено")
+        elif not order and self.filter_active():
+            self.show_notes_message("Нет заметок под выбранные фильтры")
+        elif not order:
             # Нет заметок
-            no_notes_label = Label(
-                text="Нет сохраненных заметок\n\nСоздайте заметки во вкладке 'Календарь'",
-                font_size=dp(18),
-                halign='center',
-                valign='middle',
-                size_hint_y=None,
-                height=dp(200)
-            )
-            no_notes_label.bind(size=no_notes_label.setter('text_size'))
-            self.notes_container.add_widget(no_notes_label)
+            self.show_notes_message("Нет сохраненных заметок\n\nСоздайте заметки во вкладке 'Календарь'")
         else:
-            # Добавляем заметки
-            for day_formatted, note_text, color_hex in notes_with_dates:
-                # Создаем карточку заметки
-                note_card = BoxLayout(
-                    orientation='vertical',
-                    size_hint_y=None,
-                    height=dp(120),
-                    padding=[dp(10), dp(5), dp(10), dp(5)],
-                    spacing=dp(5)
-                )
-                
-                # Верхняя часть с датой и цветом
-                top_part = BoxLayout(size_hint_y=0.4)
-                
-                date_btn = Button(
-                    text=day_formatted,
-                    background_normal='',
-                    background_color=get_color_from_hex(color_hex),
-                    size_hint_x=0.3,
-                    font_size=dp(16),
-                    bold=True
-                )
-                
-                # Кнопка перехода к дню
-                date_btn.date_str = f"{day_formatted[6:]}-{day_formatted[3:5]}-{day_formatted[:2]}"
-                date_btn.bind(on_press=self.go_to_date)
-                
-                note_preview = Label(
-                    text=note_text[:50] + ("..." if len(note_text) > 50 else ""),
-                    size_hint_x=0.7,
-                    halign='left',
-                    font_size=dp(16)
-                )
-                note_preview.bind(size=note_preview.setter('text_size'))
-                
-                top_part.add_widget(date_btn)
-                top_part.add_widget(note_preview)
-                
-                # Нижняя часть с полным текстом
-                bottom_part = BoxLayout(size_hint_y=0.6)
-                
-                full_note = Label(
-                    text=note_text,
-                    halign='left',
-                    valign='top',
-                    font_size=dp(14)
-                )
-                full_note.bind(size=full_note.setter('text_size'))
-                
-                # Кнопка редактирования
-                edit_btn = Button(
-                    text='✎',
-                    size_hint_x=0.1,
-                    font_size=dp(18)
+            # Остальные страницы дописываются при прокрутке к концу списка
+            self.notes_view.data = self.note_items(0, NOTES_PAGE)
+        
+        self.update_notes_counters(len(order))
+    
+    def show_notes_message(self, text):
+        """Показывает вместо списка одну строку с сообщением"""
+        self.notes_view.data = [{'viewclass': 'NotesEmptyLabel', 'text': text}]
+    
+    def rule_notes(self):
+        """Ближайший повтор каждого правила с текстом: дата -> данные дня"""
+        rule_days = {}
+        rules = [rule for rule in self.recurrence.rules.values() if rule['note'].strip()]
+        if not rules:
+            return rule_days
+        today = datetime.now().date()
+        color, start, end = self.note_filter
+        for rule in rules:
+            if color is not None and color_key(rule['color']) != color_key(color):
+                continue
+            # Дни с конкретной записью правило не показывает
+            date_str = self.recurrence.next_occurrence(rule, today, skip=self.saved_data)
+            if date_str is not None and (start is None or date_str >= start) and (end is None or date_str <= end):
+                rule_days[date_str] = self.recurrence.day(date_str)
+        return rule_days
+    
+    def note_items(self, start, end):
+        """Записи RecycleView для дат списка с позиции start по end"""
+        return [
+            self.note_item(date_str, self.notes_rule_days.get(date_str) or self.get_day(date_str))
+            for date_str in self.notes_order[start:end]
+        ]
+    
+    def extend_notes_list(self, *args):
+        """Дописывает следующую страницу карточек, когда список докручен почти до конца"""
+        view = self.notes_view
+        data = view.data
+        if (self.jobs.running('notes') or not data or data[0]['viewclass'] != 'NoteCard'
+                or len(data) >= len(self.notes_order)):
+            return
+        layout = view.layout_manager
+        scrollable = max(layout.height - view.height, 0)
+        if view.scroll_y * scrollable > view.height:
+            # До конца списка больше одного экрана
+            return
+        # Прокрутка отсчитывается в долях высоты, поэтому после роста списка
+        # положение восстанавливается по расстоянию от верха
+        self.notes_scroll_top = (1 - view.scroll_y) * scrollable
+        data.extend(self.note_items(len(data), len(data) + NOTES_PAGE))
+    
+    def keep_notes_scroll(self, layout, height):
+        """Оставляет видимыми те же карточки после дописывания страницы"""
+        if self.notes_scroll_top is None:
+            return
+        scrollable = height - self.notes_view.height
+        if scrollable > 0:
+            self.notes_view.scroll_y = max(0, 1 - self.notes_scroll_top / scrollable)
+        self.notes_scroll_top = None
+    
+    def note_item(self, date_str, day_data):
+        """Запись RecycleView для карточки заметки"""
+        note_text = day_data['note'].strip()
+        if 'rule' in day_data:
+            note_text = f"🔁 {note_text}"
+        return {
+            'viewclass': 'NoteCard',
+            'date_str': date_str,
+            'day_formatted': f"{date_str[8:10]}.{date_str[5:7]}.{date_str[:4]}",
+            'note_text': note_text,
+            # Цвет дня; старые цвета-списки приводятся к HEX: карточка разбирает
+            # его кэшированным parse_color, которому нужен хешируемый ключ
+            'color_hex': self.color_to_hex(day_data.get('color', '#FFFFFF'))
+        }
+    
+    def update_notes_counters(self, count):
+        """Обновляет заголовок и статус списка"""
+        self.notes_title.text = f'Все заметки ({count})'
+        self.notes_status.text = f"Найдено {count} заметок"
+    
+    def refresh_changed_notes(self, app, date_strs):
+        """Вставляет, обновляет или убирает только карточки измененных дней"""
+        if self.notes_view is None or self.loading:
+            return
+        data = self.notes_view.data
+        if (self.search_query or self.filter_active() or len(date_strs) > BULK_REFRESH_THRESHOLD
+                or (data and data[0]['viewclass'] != 'NoteCard')
+                or self.jobs.running('notes')
+                or any(self.recurrence.day(date_str) is not None for date_str in date_strs)):
+            # Поиск, фильтры, массовые операции, пустой или еще строящийся список
+            # и дни повторов (карточка правила может сдвинуться) перестраиваются целиком
+            self.update_notes_list()
+            return
+        order = self.notes_order
+        for date_str in date_strs:
+            day_data = self.saved_data.get(date_str)
+            pos = self.order_position(order, date_str)
+            present = pos < len(order) and order[pos] == date_str
+            # Карточки есть только для уже показанных страниц
+            shown = pos < len(data) or len(data) == len(order)
+            if day_data is not None and has_note(day_data):
+                if present:
+                    if pos < len(data):
+                        data[pos] = self.note_item(date_str, day_data)
+                else:
+                    order.insert(pos, date_str)
+                    if shown:
+                        data.insert(pos, self.note_item(date_str, day_data))
+            elif present:
+                order.pop(pos)
+                if pos < len(data):
+                    data.pop(pos)
+        if not order:
+            self.update_notes_list()
+            return
+        self.update_notes_counters(len(order))
+    
+    def order_position(self, order, date_str):
+        """Позиция даты в списке дат, отсортированном от новых к старым"""
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if order[mid] > date_str:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def apply_search(self, *args):
+        """Применяет текст из поля поиска"""
+        self.search_query = self.search_input.text.strip()
+        self.update_notes_list()
+    
+    def filter_active(self):
+        return self.note_filter != (None, None, None)
+    
+    def set_note_filter(self, color, start, end):
+        """Задает фильтр заметок: цвет и границы дат (None - без ограничения)"""
+        self.note_filter = (color, start, end)
+        self.update_notes_list()
+    
+    def on_color_filter(self, spinner, text):
+        """Выбор цвета в фильтре заметок"""
+        color = dict((name, hex_color_value) for hex_color_value, name in PALETTE).get(text)
+        self.set_note_filter(color, *self.note_filter[1:])
+    
+    def on_date_filter(self, spinner, text):
+        """Выбор диапазона дат в фильтре заметок"""
+        if text not in DATE_FILTER_OPTIONS:
+            # Подпись уже примененного своего диапазона
+            return
+        kind = DATE_FILTER_OPTIONS[text]
+        if kind == 'custom':
+            self.show_date_range_popup()
+            return
+        start, end = self.date_filter_range(kind)
+        self.set_note_filter(self.note_filter[0], start, end)
+    
+    def date_filter_range(self, kind):
+        """Границы текущего месяца или квартала; (None, None) - все даты"""
+        today = datetime.now().date()
+        if kind == 'month':
+            first_month = last_month = today.month
+        elif kind == 'quarter':
+            first_month = (today.month - 1) // 3 * 3 + 1
+            last_month = first_month + 2
+        else:
+            return None, None
+        last_day = calendar.monthrange(today.year, last_month)[1]
+        return f"{today.year:04d}-{first_month:02d}-01", f"{today.year:04d}-{last_month:02d}-{last_day:02d}"
+    
+    def show_date_range_popup(self):
+        """Запрашивает свой диапазон дат для фильтра заметок"""
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
+        
+        content = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        start_input = TextInput(multiline=False, hint_text='С (ГГГГ-ММ-ДД)', font_size=dp(16))
+        end_input = TextInput(multiline=False, hint_text='По (ГГГГ-ММ-ДД)', font_size=dp(16))
+        content.add_widget(start_input)
+        content.add_widget(end_input)
+        
+        popup = Popup(title='Диапазон дат', content=content, size_hint=(0.8, 0.45), auto_dismiss=False)
+        
+        def apply(btn):
+            try:
+                start, end = sorted(
+                    datetime.strptime(text_input.text.strip(), '%Y-%m-%d').date().isoformat()
+                    for text_input in (start_input, end_input)
                 )
-                edit_btn.date_str = f"{day_formatted[6:]}-{day_formatted[3:5]}-{day_formatted[:2]}"
-                edit_btn.note_text = note_text
-                edit_btn.bind(on_press=self.edit_note_from_list)
-                
-                bottom_part.add_widget(full_note)
-                bottom_part.add_widget(edit_btn)
-                
-                note_card.add_widget(top_part)
-                note_card.add_widget(bottom_part)
-                
-                # Разделитель
-                separator = BoxLayout(size_hint_y=None, height=dp(1))
-                separator.canvas.before.clear()
-                with separator.canvas.before:
-                    from kivy.graphics import Color, Rectangle
-                    Color(0.9, 0.9, 0.9, 1)
-                    Rectangle(pos=separator.pos, size=separator.size)
-                
-                self.notes_container.add_widget(note_card)
-                self.notes_container.add_widget(separator)
-        
-        # Обновляем заголовок
-        self.notes_title.text = f'Все заметки ({len(notes_with_dates)})'
-        self.notes_status.text = f"Найдено {len(notes_with_dates)} заметок"
+            except ValueError:
+                self.notes_status.text = "Даты вводятся как ГГГГ-ММ-ДД"
+                return
+            popup.dismiss()
+            self.date_filter.text = f"{start[8:10]}.{start[5:7]}.{start[:4]} - {end[8:10]}.{end[5:7]}.{end[:4]}"
+            self.set_note_filter(self.note_filter[0], start, end)
+        
+        def cancel(btn):
+            popup.dismiss()
+            # Без своего диапазона фильтр по датам снимается
+            self.date_filter.text = 'Все даты'
+        
+        btn_layout = BoxLayout(spacing=dp(10))
+        ok_btn = Button(text='Применить', font_size=dp(16))
+        ok_btn.bind(on_press=apply)
+        cancel_btn = Button(text='Отмена', font_size=dp(16))
+        cancel_btn.bind(on_press=cancel)
+        btn_layout.add_widget(ok_btn)
+        btn_layout.add_widget(cancel_btn)
+        content.add_widget(btn_layout)
+        
+        popup.open()
+    
+    def on_pause(self):
+        """Сбрасывает несохраненные изменения при сворачивании"""
+        self.jobs.finish('apply')
+        self.persistence.flush()
+        if self.sync is not None:
+            self.start_sync()
+            self.sync.save_state()
+        self.dump_profile()
+        return True
+    
+    def on_stop(self):
+        """Дописывает изменения и закрывает хранилище при выходе"""
+        self.jobs.finish('apply')
+        self.persistence.stop()
+        Logger.info(f"Storage: записей {self.persistence.writes}, объединено {self.persistence.coalesced}")
+        self.store.close()
+        if self.sync is not None:
+            self.sync.save_state()
+        self.dump_profile()
     
     def go_to_date(self, instance):
         """Переходит к указанной дате в календаре"""
@@ -696,9 +2192,5 @@ class CalendarApp(App):
         self.tabs.switch_to(self.calendar_tab)
 
 if __name__ == '__main__':
-    # Создаем файл данных если его нет
-    if not os.path.exists('calendar_data.json'):
-        with open('calendar_data.json', 'w', encoding='utf-8') as f:
-            json.dump({}, f)
-    
+    # Файл данных создается хранилищем при первой записи
     CalendarApp().run()
@@ -0,0 +1,125 @@
+from kivy.uix.widget import Widget
+from kivy.clock import Clock
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from texture_cache import text_cache
+
+
+class MonthCanvas(Widget):
+    """Сетка месяца одним виджетом: ячейки рисуются инструкциями canvas
+
+    Ячейки передаются в set_cells в том же виде, что и для сетки из кнопок
+    (date_str, text, background, color, bold). Нажатие переводится в дату
+    по координатам и передается в on_day_press, удержание - в on_day_long_press.
+    """
+    COLS = 7
+    ROWS = 6
+    # Удержание дольше этого времени - долгое нажатие (секунды)
+    LONG_PRESS_DELAY = 0.5
+
+    def __init__(self, on_day_press, on_day_long_press=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_day_press = on_day_press
+        self.on_day_long_press = on_day_long_press
+        self.spacing = dp(2)
+        self.row_height = dp(70)
+        self.font_size = dp(18)
+        self.cells = []
+        self.rows = self.ROWS
+
+        # Инструкции создаются один раз и перенастраиваются при перерисовке
+        self.instructions = []
+        with self.canvas:
+            for i in range(self.COLS * self.ROWS):
+                bg_color = Color(1, 1, 1, 0)
+                bg = Rectangle()
+                text_color = Color(0, 0, 0, 0)
+                text = Rectangle()
+                self.instructions.append((bg_color, bg, text_color, text))
+        self.bind(pos=self.redraw, size=self.redraw)
+
+    def set_cells(self, cells, rows):
+        """Задает ячейки месяца и число видимых строк"""
+        # Копия: set_cell не должен менять закэшированный список
+        self.cells = list(cells)
+        self.rows = rows
+        self.height = rows * self.row_height + (rows - 1) * self.spacing
+        self.redraw()
+
+    def cell_width(self):
+        return (self.width - (self.COLS - 1) * self.spacing) / self.COLS
+
+    def cell_pos(self, index):
+        """Левый нижний угол ячейки"""
+        row, col = divmod(index, self.COLS)
+        x = self.x + col * (self.cell_width() + self.spacing)
+        y = self.top - (row + 1) * self.row_height - row * self.spacing
+        return x, y
+
+    def set_cell(self, index, cell):
+        """Заменяет одну ячейку и перерисовывает только ее"""
+        self.cells[index] = cell
+        self.draw_cell(index, self.cell_width())
+
+    def redraw(self, *args):
+        """Обновляет инструкции по текущим ячейкам"""
+        width = self.cell_width()
+        for index in range(len(self.instructions)):
+            self.draw_cell(index, width)
+
+    def draw_cell(self, index, width):
+        """Обновляет инструкции одной ячейки"""
+        bg_color, bg, text_color, text = self.instructions[index]
+        cell = self.cells[index] if index < len(self.cells) else None
+        if cell is None or cell.date_str is None or index // self.COLS >= self.rows:
+            bg_color.a = 0
+            text_color.a = 0
+            return
+        x, y = self.cell_pos(index)
+        bg_color.rgba = cell.background
+        bg.pos = (x, y)
+        bg.size = (width, self.row_height)
+
+        # Цвет уже в текстуре, Color только делает ее видимой
+        texture = text_cache.get(cell.text, self.font_size, cell.color, cell.bold)
+        text_color.rgba = (1, 1, 1, 1)
+        text.texture = texture
+        text.size = texture.size
+        text.pos = (
+            int(x + (width - texture.width) / 2),
+            int(y + (self.row_height - texture.height) / 2)
+        )
+
+    def date_at(self, x, y):
+        """Дата ячейки под точкой или None"""
+        if not self.collide_point(x, y):
+            return None
+        col = int((x - self.x) // (self.cell_width() + self.spacing))
+        row = int((self.top - y) // (self.row_height + self.spacing))
+        if not (0 <= col < self.COLS and 0 <= row < self.rows):
+            return None
+        index = row * self.COLS + col
+        return self.cells[index].date_str if index < len(self.cells) else None
+
+    def on_touch_down(self, touch):
+        date_str = self.date_at(*touch.pos)
+        if date_str is None:
+            return super().on_touch_down(touch)
+        # Нажатие определяется при отпускании: удержание - другое действие
+        touch.grab(self)
+        long_press = None
+        if self.on_day_long_press is not None:
+            long_press = Clock.schedule_once(lambda dt: self.on_day_long_press(date_str), self.LONG_PRESS_DELAY)
+        touch.ud['month_press'] = (date_str, long_press)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        date_str, long_press = touch.ud.pop('month_press')
+        if long_press is None or long_press.is_triggered:
+            if long_press is not None:
+                long_press.cancel()
+            self.on_day_press(date_str)
+        return True
@@ -0,0 +1,103 @@
+from kivy.app import App
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.metrics import dp
+from kivy.graphics import Color, Rectangle
+from colors import parse_color
+from texture_cache import CachedTextButton
+
+class NoteCard(RecycleDataViewBehavior, BoxLayout):
+    """Карточка заметки, переиспользуемая RecycleView"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.orientation = 'vertical'
+        self.padding = [dp(10), dp(5), dp(10), dp(5)]
+        self.spacing = dp(5)
+        self.date_str = None
+        
+        # Верхняя часть с датой и цветом
+        top_part = BoxLayout(size_hint_y=0.4)
+        
+        self.date_btn = CachedTextButton(
+            background_normal='',
+            size_hint_x=0.3,
+            font_size=dp(16),
+            bold=True
+        )
+        self.date_btn.bind(on_press=self.on_date_press)
+        
+        self.note_preview = Label(
+            size_hint_x=0.7,
+            halign='left',
+            font_size=dp(16)
+        )
+        self.note_preview.bind(size=self.note_preview.setter('text_size'))
+        
+        top_part.add_widget(self.date_btn)
+        top_part.add_widget(self.note_preview)
+        
+        # Нижняя часть с полным текстом
+        bottom_part = BoxLayout(size_hint_y=0.6)
+        
+        self.full_note = Label(
+            halign='left',
+            valign='top',
+            font_size=dp(14)
+        )
+        self.full_note.bind(size=self.full_note.setter('text_size'))
+        
+        # Кнопка редактирования
+        self.edit_btn = CachedTextButton(
+            size_hint_x=0.1,
+            font_size=dp(18)
+        )
+        self.edit_btn.set_cached_text('✎', dp(18), (1, 1, 1, 1))
+        self.edit_btn.bind(on_press=self.on_edit_press)
+        
+        bottom_part.add_widget(self.full_note)
+        bottom_part.add_widget(self.edit_btn)
+        
+        self.add_widget(top_part)
+        self.add_widget(bottom_part)
+        
+        # Разделитель
+        with self.canvas.after:
+            Color(0.9, 0.9, 0.9, 1)
+            self.separator = Rectangle(size=(0, dp(1)))
+        self.bind(pos=self.update_separator, size=self.update_separator)
+    
+    def update_separator(self, *args):
+        """Держит разделитель у нижнего края карточки"""
+        self.separator.pos = (self.x, self.y - dp(3))
+        self.separator.size = (self.width, dp(1))
+    
+    def refresh_view_attrs(self, rv, index, data):
+        """Привязывает карточку к записи из списка данных"""
+        note_text = data['note_text']
+        self.date_str = data['date_str']
+        self.date_btn.set_cached_text(data['day_formatted'], dp(16), (1, 1, 1, 1), True)
+        self.date_btn.background_color = parse_color(data['color_hex'])
+        self.note_preview.text = note_text[:50] + ("..." if len(note_text) > 50 else "")
+        self.full_note.text = note_text
+        self.edit_btn.note_text = note_text
+        self.date_btn.date_str = self.date_str
+        self.edit_btn.date_str = self.date_str
+        return super().refresh_view_attrs(rv, index, {})
+    
+    def on_date_press(self, instance):
+        """Кнопка перехода к дню"""
+        App.get_running_app().go_to_date(instance)
+    
+    def on_edit_press(self, instance):
+        """Кнопка редактирования"""
+        App.get_running_app().edit_note_from_list(instance)
+
+class NotesEmptyLabel(RecycleDataViewBehavior, Label):
+    """Сообщение о пустом списке заметок"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.font_size = dp(18)
+        self.halign = 'center'
+        self.valign = 'middle'
+        self.bind(size=self.setter('text_size'))
@@ -0,0 +1,85 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+Logger = logging.getLogger('calendar.perf')
+
+
+def percentile(values, fraction):
+    """Перцентиль по отсортированной копии значений"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Profiler:
+    """Замеры времени горячих путей и трасса для Chrome/Perfetto
+
+    Выключенный профилировщик ничего не оборачивает, поэтому горячие пути
+    работают без накладных расходов. Включенный заменяет методы объекта
+    обертками, которые пишут длительность в скользящее окно и в трассу.
+    """
+    def __init__(self, window=200, max_events=100000):
+        self.window = window
+        self.samples = {}
+        self.events = deque(maxlen=max_events)
+        self.counters = {}
+        self.start = time.perf_counter()
+        self.pid = os.getpid()
+
+    def now_us(self):
+        """Время от старта профилировщика в микросекундах"""
+        return (time.perf_counter() - self.start) * 1e6
+
+    def record(self, name, begin_us, duration_us):
+        """Записывает одно завершенное событие"""
+        self.samples.setdefault(name, deque(maxlen=self.window)).append(duration_us / 1000)
+        self.events.append({
+            'name': name, 'ph': 'X', 'ts': begin_us, 'dur': duration_us,
+            'pid': self.pid, 'tid': threading.get_ident()
+        })
+
+    def counter(self, name, value):
+        """Записывает значение счетчика (например, число виджетов)"""
+        self.counters[name] = value
+        self.events.append({
+            'name': name, 'ph': 'C', 'ts': self.now_us(),
+            'pid': self.pid, 'args': {name: value}
+        })
+
+    def wrap(self, name, func):
+        """Обертка, замеряющая каждый вызов func"""
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            begin = self.now_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, begin, self.now_us() - begin)
+        return timed
+
+    def instrument(self, obj, names):
+        """Подменяет методы объекта замеряющими обертками"""
+        for name in names:
+            setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def summary(self):
+        """p50/p95 в миллисекундах по каждому замеру"""
+        return {
+            name: {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95), 'count': len(values)}
+            for name, values in self.samples.items()
+        }
+
+    def dump_trace(self, path):
+        """Сохраняет трассу в формате Chrome Trace Event"""
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}, f)
+            Logger.info('Perf: трасса записана в %s', path)
+        except OSError as e:
+            Logger.error('Perf: не удалось записать трассу %s: %s', path, e)
@@ -0,0 +1,338 @@
+import sys
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping, MutableMapping
+from datetime import date, datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def date_ordinal(date_str):
+    """Ординал даты формата YYYY-MM-DD или None для других ключей"""
+    if not isinstance(date_str, str) or len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
+        return None
+    try:
+        return date.fromisoformat(date_str).toordinal()
+    except ValueError:
+        return None
+
+
+class DayRecord(Mapping):
+    """Неизменяемые данные дня без словаря на каждую запись
+
+    Снаружи запись выглядит как прежний словарь {'color', 'note',
+    'last_modified'}: поддерживает get, in, [] и dict(record). Внутри цвет -
+    интернированная строка (одна на всю палитру), время изменения - целое
+    число микросекунд от 1970-01-01. Все, что так не представимо (цвет
+    списком, лишние ключи, время в другом формате), лежит в extra как есть.
+    """
+    __slots__ = ('color', 'note', 'modified', 'extra')
+
+    def __init__(self, color=None, note=None, modified=None, extra=None):
+        self.color = color
+        self.note = note
+        self.modified = modified
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, day_data):
+        """Запись из словаря формата JSON"""
+        if isinstance(day_data, DayRecord):
+            return day_data
+        extra = {}
+        color = day_data.get('color')
+        if color is not None and not isinstance(color, str):
+            extra['color'] = color
+            color = None
+        elif color is not None:
+            color = sys.intern(color)
+        note = day_data.get('note')
+        if note is not None and not isinstance(note, str):
+            extra['note'] = note
+            note = None
+        modified = day_data.get('last_modified')
+        if modified is not None:
+            modified_us = cls.pack_modified(modified)
+            if modified_us is None:
+                extra['last_modified'] = modified
+            modified = modified_us
+        for key, value in day_data.items():
+            if key not in ('color', 'note', 'last_modified'):
+                extra[key] = value
+        return cls(color, note, modified, extra or None)
+
+    @staticmethod
+    def pack_modified(modified):
+        """Микросекунды от 1970-01-01, если строку можно восстановить без потерь"""
+        try:
+            moment = datetime.fromisoformat(modified)
+        except (TypeError, ValueError):
+            return None
+        if moment.tzinfo is not None:
+            return None
+        modified_us = (moment - EPOCH) // MICROSECOND
+        if (EPOCH + timedelta(microseconds=modified_us)).isoformat() != modified:
+            return None
+        return modified_us
+
+    def edited(self, modified, note=None):
+        """Копия записи с новым временем изменения (микросекунды, как у pack_modified)
+        и, если задана, другой заметкой"""
+        extra = self.extra
+        if extra is not None:
+            replaced = ('last_modified',) if note is None else ('note', 'last_modified')
+            extra = {key: value for key, value in extra.items() if key not in replaced}
+        return DayRecord(self.color, self.note if note is None else note, modified, extra or None)
+
+    def to_dict(self):
+        """Словарь формата JSON; быстрее, чем dict(record)"""
+        day_data = {}
+        if self.color is not None:
+            day_data['color'] = self.color
+        if self.note is not None:
+            day_data['note'] = self.note
+        if self.modified is not None:
+            day_data['last_modified'] = (EPOCH + timedelta(microseconds=self.modified)).isoformat()
+        if self.extra is not None:
+            day_data.update(self.extra)
+        return day_data
+
+    def get(self, key, default=None):
+        # Без исключения внутри, как у унаследованного от Mapping
+        if key == 'note' and self.note is not None:
+            return self.note
+        if key == 'color' and self.color is not None:
+            return self.color
+        if key == 'last_modified' and self.modified is not None:
+            return (EPOCH + timedelta(microseconds=self.modified)).isoformat()
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key == 'color' and self.color is not None:
+            return self.color
+        if key == 'note' and self.note is not None:
+            return self.note
+        if key == 'last_modified' and self.modified is not None:
+            return (EPOCH + timedelta(microseconds=self.modified)).isoformat()
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return ((key == 'color' and self.color is not None)
+                or (key == 'note' and self.note is not None)
+                or (key == 'last_modified' and self.modified is not None)
+                or (self.extra is not None and key in self.extra))
+
+    def __iter__(self):
+        if self.color is not None:
+            yield 'color'
+        if self.note is not None:
+            yield 'note'
+        if self.modified is not None:
+            yield 'last_modified'
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return ((self.color is not None) + (self.note is not None) + (self.modified is not None)
+                + (len(self.extra) if self.extra is not None else 0))
+
+    def __repr__(self):
+        return f'DayRecord({dict(self)!r})'
+
+
+class CompactDays(MutableMapping):
+    """Данные дней: ординал даты -> DayRecord и отсортированный массив ординалов
+
+    Ключи снаружи - строки YYYY-MM-DD, как у прежнего словаря saved_data;
+    внутри строки дат не хранятся. Массив ординалов заменяет индекс по
+    месяцам: дни месяца находятся двоичным поиском. Ключи, не похожие на
+    даты, хранятся отдельно как есть.
+    """
+    def __init__(self, data=()):
+        self.records = {}
+        self.ordinals = array('i')
+        # Массовая загрузка дописывает ординалы в конец и сортирует их один раз
+        self.unsorted = False
+        self.other = {}
+        self.update(data)
+
+    def ensure_sorted(self):
+        if self.unsorted:
+            self.ordinals = array('i', sorted(self.ordinals))
+            self.unsorted = False
+
+    def __getitem__(self, date_str):
+        ordinal = date_ordinal(date_str)
+        if ordinal is None:
+            return self.other[date_str]
+        return self.records[ordinal]
+
+    def get(self, date_str, default=None):
+        ordinal = date_ordinal(date_str)
+        if ordinal is None:
+            return self.other.get(date_str, default)
+        return self.records.get(ordinal, default)
+
+    def __contains__(self, date_str):
+        ordinal = date_ordinal(date_str)
+        if ordinal is None:
+            return date_str in self.other
+        return ordinal in self.records
+
+    def __setitem__(self, date_str, day_data):
+        ordinal = date_ordinal(date_str)
+        if ordinal is None:
+            self.other[date_str] = day_data
+            return
+        if ordinal not in self.records:
+            if self.unsorted:
+                self.ordinals.append(ordinal)
+            else:
+                insort(self.ordinals, ordinal)
+        self.records[ordinal] = DayRecord.from_dict(day_data)
+
+    def __delitem__(self, date_str):
+        ordinal = date_ordinal(date_str)
+        if ordinal is None:
+            del self.other[date_str]
+            return
+        del self.records[ordinal]
+        self.ensure_sorted()
+        del self.ordinals[bisect_left(self.ordinals, ordinal)]
+
+    def __iter__(self):
+        for ordinal in list(self.records):
+            yield date.fromordinal(ordinal).isoformat()
+        yield from list(self.other)
+
+    def __len__(self):
+        return len(self.records) + len(self.other)
+
+    def items(self):
+        """Пары (дата, запись) без повторного разбора ключей"""
+        for ordinal, record in list(self.records.items()):
+            yield date.fromordinal(ordinal).isoformat(), record
+        yield from list(self.other.items())
+
+    def update(self, data=(), **kwargs):
+        """Массово добавляет дни (словарь или пары)"""
+        pairs = data.items() if isinstance(data, Mapping) else data
+        for date_str, day_data in pairs:
+            ordinal = date_ordinal(date_str)
+            if ordinal is None:
+                self.other[date_str] = day_data
+                continue
+            if ordinal not in self.records:
+                self.ordinals.append(ordinal)
+                self.unsorted = True
+            self.records[ordinal] = DayRecord.from_dict(day_data)
+        for date_str, day_data in kwargs.items():
+            self[date_str] = day_data
+
+    def apply(self, changes):
+        """Записывает пакет версий дней (None - удаление)
+
+        Возвращает дата -> (запись до, запись после) для реально измененных
+        дней. Каждая дата разбирается один раз, а удаленные ординалы убираются
+        из массива одним проходом.
+        """
+        days = {}
+        removed = []
+        for date_str, day_data in changes.items():
+            ordinal = date_ordinal(date_str)
+            if ordinal is None:
+                before = self.other.get(date_str)
+                if day_data is None:
+                    if before is None:
+                        continue
+                    del self.other[date_str]
+                else:
+                    self.other[date_str] = day_data
+                days[date_str] = (before, day_data)
+                continue
+            before = self.records.get(ordinal)
+            if day_data is None:
+                if before is None:
+                    continue
+                del self.records[ordinal]
+                removed.append(ordinal)
+                days[date_str] = (before, None)
+            else:
+                if before is None:
+                    self.ordinals.append(ordinal)
+                    self.unsorted = True
+                record = self.records[ordinal] = DayRecord.from_dict(day_data)
+                days[date_str] = (before, record)
+        if len(removed) > 16:
+            self.ordinals = array('i', [ordinal for ordinal in self.ordinals if ordinal in self.records])
+        else:
+            self.ensure_sorted()
+            for ordinal in removed:
+                pos = bisect_left(self.ordinals, ordinal)
+                if pos < len(self.ordinals) and self.ordinals[pos] == ordinal:
+                    del self.ordinals[pos]
+        return days
+
+    def sorted_chunks(self, size):
+        """Пары (дата, запись) по возрастанию даты порциями по size
+
+        Порядок берется из копии массива ординалов, поэтому правки между
+        порциями не ломают обход: удаленные дни пропускаются, новые не
+        попадают. Ключи, не похожие на даты, идут последней порцией.
+        """
+        self.ensure_sorted()
+        ordinals = self.ordinals[:]
+        for start in range(0, len(ordinals), size):
+            chunk = []
+            for ordinal in ordinals[start:start + size]:
+                record = self.records.get(ordinal)
+                if record is not None:
+                    chunk.append((date.fromordinal(ordinal).isoformat(), record))
+            yield chunk
+        if self.other:
+            yield sorted(self.other.items())
+
+    def frozen(self):
+        """Копия для чтения из другого потока
+
+        Записи неизменяемы, поэтому копируются только списки ссылок на них;
+        словари формата JSON собирает уже читающий поток.
+        """
+        return FrozenDays(list(self.records), list(self.records.values()), list(self.other.items()))
+
+    def month(self, year, month):
+        """Дни месяца: дата -> запись"""
+        self.ensure_sorted()
+        first = date(year, month, 1).toordinal()
+        last = date(year + month // 12, month % 12 + 1, 1).toordinal()
+        prefix = f'{year:04d}-{month:02d}-'
+        return {
+            f'{prefix}{ordinal - first + 1:02d}': self.records[ordinal]
+            for ordinal in self.ordinals[bisect_left(self.ordinals, first):bisect_left(self.ordinals, last)]
+        }
+
+
+class FrozenDays:
+    """Снимок CompactDays на момент вызова frozen"""
+    __slots__ = ('ordinals', 'records', 'other')
+
+    def __init__(self, ordinals, records, other):
+        # Ординалы и записи - два параллельных списка: без кортежа на день
+        self.ordinals = ordinals
+        self.records = records
+        self.other = other
+
+    def to_dict(self):
+        """Обычный словарь дата -> словарь дня"""
+        data = {
+            date.fromordinal(ordinal).isoformat(): record.to_dict()
+            for ordinal, record in zip(self.ordinals, self.records)
+        }
+        for key, day_data in self.other:
+            data[key] = dict(day_data) if isinstance(day_data, Mapping) else day_data
+        return data
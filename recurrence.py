@@ -0,0 +1,172 @@
+import calendar
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import date, timedelta
+
+Logger = logging.getLogger('calendar.recurrence')
+
+# Частоты повторения: daily, weekly (по дням недели), monthly (по числу), yearly
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+def expand_rule(rule, year, month):
+    """Даты (YYYY-MM-DD) месяца, на которые выпадает правило, кроме исключенных"""
+    start = date.fromisoformat(rule['start'])
+    until = date.fromisoformat(rule['until']) if rule.get('until') else None
+    days_in_month = calendar.monthrange(year, month)[1]
+    freq = rule['freq']
+
+    if freq == 'daily':
+        days = range(1, days_in_month + 1)
+    elif freq == 'weekly':
+        weekdays = set(rule.get('weekdays') or [start.weekday()])
+        first_weekday = calendar.monthrange(year, month)[0]
+        days = [day for day in range(1, days_in_month + 1) if (first_weekday + day - 1) % 7 in weekdays]
+    elif freq == 'monthly':
+        days = [start.day] if start.day <= days_in_month else []
+    elif freq == 'yearly':
+        days = [start.day] if month == start.month and start.day <= days_in_month else []
+    else:
+        days = []
+
+    # Правила из старых файлов исключений не имеют
+    exdates = set(rule.get('exdates') or ())
+    for day in days:
+        current = date(year, month, day)
+        if current < start or (until is not None and current > until):
+            continue
+        date_str = current.isoformat()
+        if date_str not in exdates:
+            yield date_str
+
+
+class RecurrenceEngine:
+    """Правила повторения, хранящиеся один раз и раскрываемые по месяцам
+
+    Раскрытие месяца запоминается по (год, месяц); любое изменение правил
+    сбрасывает память. Конкретные записи дней перекрывают правила - это
+    делает вызывающий код.
+    """
+    def __init__(self, path='calendar_rules.json', memo_size=24):
+        self.path = path
+        self.memo_size = memo_size
+        self.rules = {}
+        self.memo = OrderedDict()
+
+    def load(self):
+        """Читает правила из файла"""
+        self.rules = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for rule in json.load(f):
+                        self.rules[rule['id']] = rule
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                Logger.error('Recurrence: не удалось прочитать %s: %s', self.path, e)
+        self.invalidate()
+
+    def save(self):
+        """Атомарно записывает правила"""
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self.rules.values()), f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            Logger.error('Recurrence: не удалось записать %s: %s', self.path, e)
+
+    def invalidate(self):
+        """Сбрасывает запомненные раскрытия"""
+        self.memo.clear()
+
+    def add_rule(self, freq, start, color, note, weekdays=None, until=None):
+        """Добавляет правило и возвращает его"""
+        if freq not in FREQUENCIES:
+            raise ValueError(f'неизвестная частота: {freq}')
+        rule = {
+            'id': max(self.rules, default=0) + 1,
+            'freq': freq,
+            'start': start,
+            'until': until,
+            'weekdays': list(weekdays) if weekdays else None,
+            'exdates': [],
+            'color': color,
+            'note': note
+        }
+        self.rules[rule['id']] = rule
+        self.save()
+        self.invalidate()
+        return rule
+
+    def remove_rule(self, rule_id):
+        """Удаляет правило и возвращает его (или None)"""
+        rule = self.rules.pop(rule_id, None)
+        if rule is not None:
+            self.save()
+            self.invalidate()
+        return rule
+
+    def exclude_date(self, rule_id, date_str):
+        """Убирает из правила одну дату; возвращает версии правила (до, после) или None
+
+        Правило заменяется новым словарем, а не меняется на месте: прежняя
+        версия остается годной для отмены через restore_rule.
+        """
+        rule = self.rules.get(rule_id)
+        if rule is None:
+            return None
+        changed = dict(rule, exdates=sorted(set(rule.get('exdates') or ()) | {date_str}))
+        self.rules[rule_id] = changed
+        self.save()
+        self.invalidate()
+        return rule, changed
+
+    def restore_rule(self, rule_id, rule):
+        """Возвращает правило в прежнем виде (None - правила не было)"""
+        if rule is None:
+            self.rules.pop(rule_id, None)
+        else:
+            self.rules[rule_id] = rule
+        self.save()
+        self.invalidate()
+
+    def month(self, year, month):
+        """Дни месяца, порожденные правилами: дата -> данные дня"""
+        key = (year, month)
+        days = self.memo.get(key)
+        if days is not None:
+            self.memo.move_to_end(key)
+            return days
+        days = {}
+        # При совпадении дат побеждает более позднее правило
+        for rule_id in sorted(self.rules):
+            rule = self.rules[rule_id]
+            for date_str in expand_rule(rule, year, month):
+                days[date_str] = {'color': rule['color'], 'note': rule['note'], 'rule': rule_id}
+        self.memo[key] = days
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return days
+
+    def day(self, date_str):
+        """Данные дня по правилам или None"""
+        return self.month(int(date_str[:4]), int(date_str[5:7])).get(date_str)
+
+    def next_occurrence(self, rule, since, skip=(), horizon_days=400):
+        """Ближайшая дата правила не раньше since, кроме дат из skip"""
+        current = max(since, date.fromisoformat(rule['start']))
+        current_str = current.isoformat()
+        end = since + timedelta(days=horizon_days)
+        end_str = end.isoformat()
+        year, month = current.year, current.month
+        while date(year, month, 1) <= end:
+            days = self.month(year, month)
+            for date_str in sorted(days):
+                if date_str > end_str:
+                    return None
+                if date_str >= current_str and date_str not in skip and days[date_str]['rule'] == rule['id']:
+                    return date_str
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return None
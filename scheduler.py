@@ -0,0 +1,81 @@
+import time
+
+from kivy.clock import Clock
+
+
+class FrameJob:
+    """Операция, выполняемая по шагам генератора"""
+    __slots__ = ('steps', 'on_progress', 'on_done', 'event')
+
+    def __init__(self, steps, on_progress, on_done):
+        self.steps = steps
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.event = None
+
+
+class FrameScheduler:
+    """Кооперативный планировщик долгих операций интерфейса поверх Clock
+
+    Операция - генератор, который делает небольшую порцию работы и
+    возвращает (сделано, всего) или None. За кадр выполняется столько шагов,
+    сколько помещается в бюджет; остальное переносится на следующий кадр.
+    Новый запуск операции с тем же именем отменяет незавершенную.
+    """
+    def __init__(self, budget=0.008):
+        self.budget = budget
+        self.jobs = {}
+
+    def run(self, name, steps, on_progress=None, on_done=None):
+        """Запускает операцию; первая порция выполняется сразу"""
+        self.cancel(name)
+        job = self.jobs[name] = FrameJob(steps, on_progress, on_done)
+        self.advance(name, job)
+
+    def cancel(self, name):
+        """Отменяет незавершенную операцию"""
+        job = self.jobs.pop(name, None)
+        if job is not None:
+            if job.event is not None:
+                job.event.cancel()
+            job.steps.close()
+
+    def finish(self, name):
+        """Выполняет оставшиеся шаги операции сразу, не дожидаясь кадров"""
+        job = self.jobs.pop(name, None)
+        if job is None:
+            return
+        if job.event is not None:
+            job.event.cancel()
+        for progress in job.steps:
+            pass
+        if job.on_done is not None:
+            job.on_done()
+
+    def running(self, name):
+        return name in self.jobs
+
+    @property
+    def active(self):
+        return bool(self.jobs)
+
+    def advance(self, name, job, dt=None):
+        """Выполняет шаги операции в пределах бюджета кадра"""
+        if self.jobs.get(name) is not job:
+            return
+        deadline = time.perf_counter() + self.budget
+        progress = None
+        try:
+            while time.perf_counter() < deadline:
+                progress = next(job.steps)
+        except StopIteration:
+            del self.jobs[name]
+            if job.on_done is not None:
+                job.on_done()
+            return
+        except Exception:
+            del self.jobs[name]
+            raise
+        if progress is not None and job.on_progress is not None:
+            job.on_progress(*progress)
+        job.event = Clock.schedule_once(lambda dt: self.advance(name, job), 0)
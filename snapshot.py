@@ -0,0 +1,194 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+from datetime import date, datetime, timedelta
+
+Logger = logging.getLogger('calendar.snapshot')
+
+MAGIC = b'CALB'
+VERSION = 1
+
+# Заголовок: сигнатура, версия, резерв, число записей, размер и mtime_ns
+# снимка JSON, из которого построен файл
+HEADER = struct.Struct('<4sHHIQQ')
+
+# Запись индекса: ординал дня, цвет с флагами, смещение и длина заметки
+# в куче, last_modified в микросекундах от 1970-01-01
+RECORD = struct.Struct('<iIIIq')
+
+# Флаги в старших битах поля цвета (младшие 24 бита - RGB)
+HAS_COLOR = 1 << 24
+LOWER_HEX = 1 << 25
+RAW_JSON = 1 << 26
+
+NO_MODIFIED = -(1 << 63)
+EPOCH = datetime(1970, 1, 1)
+HEX_RE = re.compile(r'#[0-9A-Fa-f]{6}')
+
+
+def pack_day(date_str, day_data):
+    """Поля записи индекса и байты для кучи
+
+    Дни, которые нельзя упаковать без потерь (другие ключи, цвет списком,
+    дата изменения в другом формате), хранятся в куче целиком как JSON.
+    """
+    ordinal = date.fromisoformat(date_str).toordinal()
+    color = day_data.get('color')
+    note = day_data.get('note')
+    modified = day_data.get('last_modified')
+    compact = (
+        set(day_data) <= {'color', 'note', 'last_modified'}
+        and isinstance(note, str)
+        and (color is None or (isinstance(color, str) and HEX_RE.fullmatch(color)
+                               and color in (color.upper(), color.lower())))
+    )
+    modified_us = NO_MODIFIED
+    if compact and modified is not None:
+        try:
+            moment = datetime.fromisoformat(modified)
+            modified_us = (moment - EPOCH) // timedelta(microseconds=1)
+            compact = moment.tzinfo is None and (EPOCH + timedelta(microseconds=modified_us)).isoformat() == modified
+        except (TypeError, ValueError):
+            compact = False
+    if not compact:
+        raw = json.dumps(day_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return ordinal, RAW_JSON, raw, NO_MODIFIED
+
+    bits = 0
+    if color is not None:
+        bits = HAS_COLOR | int(color[1:], 16)
+        if color != color.upper():
+            bits |= LOWER_HEX
+    return ordinal, bits, note.encode('utf-8'), modified_us
+
+
+def unpack_day(bits, heap_bytes, modified_us):
+    """Данные дня из полей записи индекса"""
+    if bits & RAW_JSON:
+        return json.loads(heap_bytes.decode('utf-8'))
+    day_data = {}
+    if bits & HAS_COLOR:
+        color = f'#{bits & 0xFFFFFF:06X}'
+        day_data['color'] = color.lower() if bits & LOWER_HEX else color
+    day_data['note'] = heap_bytes.decode('utf-8')
+    if modified_us != NO_MODIFIED:
+        day_data['last_modified'] = (EPOCH + timedelta(microseconds=modified_us)).isoformat()
+    return day_data
+
+
+class BinarySnapshot:
+    """Двоичная копия снимка JSON для быстрого холодного старта
+
+    Файл - индекс записей фиксированной ширины, отсортированный по дате, и
+    куча заметок в UTF-8. Он открывается через mmap, поэтому дни одного
+    месяца находятся двоичным поиском без разбора остальных записей.
+    Источник данных - JSON; если он изменился, копия считается устаревшей.
+    """
+    def __init__(self, path, source_path):
+        self.path = path
+        self.source_path = source_path
+
+    def source_stat(self):
+        """(размер, mtime_ns) снимка JSON или None"""
+        try:
+            stat = os.stat(self.source_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def write(self, data, source_stat):
+        """Пишет копию данных, построенных из JSON с указанным source_stat"""
+        if source_stat is None:
+            return False
+        try:
+            packed = sorted(pack_day(date_str, day_data) for date_str, day_data in data.items())
+        except (TypeError, ValueError) as e:
+            Logger.warning('Snapshot: данные нельзя упаковать: %s', e)
+            return False
+
+        index = bytearray(HEADER.pack(MAGIC, VERSION, 0, len(packed), *source_stat))
+        heap = bytearray()
+        for ordinal, bits, heap_bytes, modified_us in packed:
+            index += RECORD.pack(ordinal, bits, len(heap), len(heap_bytes), modified_us)
+            heap += heap_bytes
+
+        # Снимок может пересобираться из двух потоков одновременно
+        tmp_path = f'{self.path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(index)
+                f.write(heap)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError as e:
+            Logger.error('Snapshot: не удалось записать %s: %s', self.path, e)
+            return False
+
+    def open(self):
+        """Отображение файла и число записей или None, если копия устарела"""
+        try:
+            with open(self.path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mapping) >= HEADER.size:
+            magic, version, _, count, size, mtime_ns = HEADER.unpack_from(mapping)
+            if (magic == MAGIC and version == VERSION and (size, mtime_ns) == self.source_stat()
+                    and len(mapping) >= HEADER.size + count * RECORD.size):
+                return mapping, count
+        mapping.close()
+        return None
+
+    def lower_bound(self, mapping, count, ordinal):
+        """Номер первой записи с ординалом не меньше заданного"""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if struct.unpack_from('<i', mapping, HEADER.size + mid * RECORD.size)[0] < ordinal:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def read_range(self, mapping, count, start, end):
+        """Дни записей с номерами [start, end)"""
+        heap_start = HEADER.size + count * RECORD.size
+        data = {}
+        for ordinal, bits, offset, length, modified_us in RECORD.iter_unpack(
+                mapping[HEADER.size + start * RECORD.size:HEADER.size + end * RECORD.size]):
+            heap_bytes = mapping[heap_start + offset:heap_start + offset + length]
+            data[date.fromordinal(ordinal).isoformat()] = unpack_day(bits, heap_bytes, modified_us)
+        return data
+
+    def month(self, year, month):
+        """Дни одного месяца или None, если копия недоступна"""
+        opened = self.open()
+        if opened is None:
+            return None
+        mapping, count = opened
+        try:
+            first = date(year, month, 1).toordinal()
+            last = date(year + month // 12, month % 12 + 1, 1).toordinal()
+            return self.read_range(
+                mapping, count,
+                self.lower_bound(mapping, count, first), self.lower_bound(mapping, count, last)
+            )
+        finally:
+            mapping.close()
+
+    def load(self):
+        """Все дни или None, если копия недоступна"""
+        opened = self.open()
+        if opened is None:
+            return None
+        mapping, count = opened
+        try:
+            return self.read_range(mapping, count, 0, count)
+        finally:
+            mapping.close()
@@ -0,0 +1,583 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from records import CompactDays, DayRecord, FrozenDays
+from snapshot import BinarySnapshot
+
+Logger = logging.getLogger('calendar.storage')
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_object(text):
+    """Пары (ключ, значение) объекта JSON верхнего уровня, разбираемые по одной
+
+    json.loads разбирает весь текст одним вызовом C и все это время держит
+    GIL, поэтому фоновая загрузка большого снимка останавливала кадры
+    главного потока. Здесь каждый вызов C разбирает одно значение, и между
+    ними поток отдает GIL.
+    """
+    decoder = json.JSONDecoder()
+    pos = WHITESPACE_RE.match(text).end()
+    if text[pos:pos + 1] != '{':
+        raise ValueError('снимок должен быть объектом JSON')
+    pos = WHITESPACE_RE.match(text, pos + 1).end()
+    if text[pos:pos + 1] == '}':
+        end = pos + 1
+    else:
+        while True:
+            if text[pos:pos + 1] != '"':
+                raise ValueError(f'ожидался ключ в позиции {pos}')
+            key, pos = decoder.raw_decode(text, pos)
+            pos = WHITESPACE_RE.match(text, pos).end()
+            if text[pos:pos + 1] != ':':
+                raise ValueError(f'ожидалось ":" в позиции {pos}')
+            value, pos = decoder.raw_decode(text, WHITESPACE_RE.match(text, pos + 1).end())
+            yield key, value
+            pos = WHITESPACE_RE.match(text, pos).end()
+            separator = text[pos:pos + 1]
+            if separator == '}':
+                end = pos + 1
+                break
+            if separator != ',':
+                raise ValueError(f'ожидалось "," или "}}" в позиции {pos}')
+            pos = WHITESPACE_RE.match(text, pos + 1).end()
+    if WHITESPACE_RE.match(text, end).end() != len(text):
+        raise ValueError('лишние данные после объекта JSON')
+
+
+class JournalStore:
+    """Хранилище данных: снимок JSON + журнал изменений
+
+    Каждое изменение дописывается в журнал одной строкой. Когда журнал
+    превышает порог, снимок пересобирается в фоне и атомарно заменяется.
+    Старый calendar_data.json без журнала читается как обычный снимок.
+    Рядом со снимком лежит его двоичная копия (calendar_data.bin), из
+    которой данные читаются при запуске; JSON остается форматом обмена.
+    """
+    lazy = False
+
+    def __init__(self, path='calendar_data.json', compact_threshold=256 * 1024):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.rotated_path = path + '.journal.old'
+        self.binary = BinarySnapshot(os.path.splitext(path)[0] + '.bin', path)
+        self.compact_threshold = compact_threshold
+        self.lock = threading.Lock()
+        self.journal = None
+        self.compaction = None
+
+    def load(self):
+        """Читает снимок и применяет к нему журнал"""
+        data = self.binary.load()
+        if data is None:
+            # Двоичной копии нет или она устарела: читаем JSON и пересобираем ее
+            source_stat = self.binary.source_stat()
+            data = self.read_snapshot()
+            self.binary.write(data, source_stat)
+        # .journal.old остается, если приложение упало во время сжатия
+        for path in (self.rotated_path, self.journal_path):
+            self.replay(path, data)
+        return data
+
+    def load_month(self, year, month):
+        """Быстро извлекает дни одного месяца, не разбирая весь снимок"""
+        prefix = f"{year:04d}-{month:02d}-"
+        data = self.binary.month(year, month)
+        if data is None:
+            data = self.scan_month(prefix)
+        for path in (self.rotated_path, self.journal_path):
+            self.replay(path, data, prefix)
+        return data
+
+    def scan_month(self, prefix):
+        """Ищет дни месяца в тексте снимка JSON
+
+        Ключи дней ищутся по тексту: внутри строк JSON кавычки экранированы,
+        поэтому совпадение "YYYY-MM-DD": возможно только у настоящего ключа.
+        """
+        data = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            text = ''
+        decoder = json.JSONDecoder()
+        for match in re.finditer(r'"(' + re.escape(prefix) + r'\d\d)"\s*:\s*', text):
+            try:
+                day_data = decoder.raw_decode(text, match.end())[0]
+            except ValueError:
+                continue
+            if isinstance(day_data, dict):
+                data[match.group(1)] = day_data
+        return data
+
+    def read_snapshot(self):
+        """Читает снимок, поврежденный файл откладывает в сторону"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            # Снимок читается в фоновом потоке: разбор по одному дню не держит GIL долго
+            return dict(iter_json_object(text))
+        except (OSError, ValueError) as e:
+            Logger.error('Storage: не удалось прочитать %s: %s', self.path, e)
+            try:
+                os.replace(self.path, self.path + '.corrupt')
+            except OSError:
+                pass
+            return {}
+
+    def replay(self, path, data, prefix=''):
+        """Применяет записи журнала к данным (только к датам с префиксом)"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Оборванная последняя строка после сбоя
+                    Logger.warning('Storage: пропущена запись %s:%d', path, line_no)
+                    continue
+                if record.get('date', '').startswith(prefix):
+                    self.apply(record, data)
+
+    @staticmethod
+    def apply(record, data):
+        """Применяет одну запись журнала"""
+        if record.get('op') == 'put':
+            data[record['date']] = record['data']
+        elif record.get('op') == 'del':
+            data.pop(record['date'], None)
+
+    def put(self, date_str, day_data):
+        """Записывает данные дня"""
+        self.append([{'op': 'put', 'date': date_str, 'data': day_data}])
+
+    def delete(self, date_str):
+        """Удаляет день"""
+        self.append([{'op': 'del', 'date': date_str}])
+
+    def put_many(self, items):
+        """Записывает несколько дней одной операцией"""
+        self.append([
+            {'op': 'put', 'date': date_str, 'data': day_data}
+            for date_str, day_data in items
+        ])
+
+    def apply_batch(self, changes):
+        """Записывает пакет изменений: (дата, данные) или (дата, None) для удаления"""
+        self.append([
+            {'op': 'put', 'date': date_str, 'data': day_data} if day_data is not None
+            else {'op': 'del', 'date': date_str}
+            for date_str, day_data in changes
+        ])
+
+    def append(self, records):
+        """Дописывает записи в журнал"""
+        if not records:
+            return
+        chunk = ''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+            for record in records
+        )
+        with self.lock:
+            if self.journal is None:
+                self.journal = open(self.journal_path, 'a', encoding='utf-8')
+                if self.journal.tell() and not self.ends_with_newline():
+                    # Отделяем оборванную строку, чтобы не склеить записи
+                    chunk = '\n' + chunk
+            self.journal.write(chunk)
+            self.journal.flush()
+
+    def ends_with_newline(self):
+        """Проверяет, что журнал заканчивается целой строкой"""
+        with open(self.journal_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def journal_size(self):
+        """Размер текущего журнала в байтах"""
+        try:
+            return os.path.getsize(self.journal_path)
+        except OSError:
+            return 0
+
+    def maybe_compact(self, data):
+        """Запускает фоновое сжатие, если журнал вырос"""
+        if self.journal_size() < self.compact_threshold:
+            return False
+        if self.compaction is not None and self.compaction.is_alive():
+            return False
+        snapshot = self.rotate(data)
+        self.compaction = threading.Thread(
+            target=self.write_snapshot, args=(snapshot,), daemon=True
+        )
+        self.compaction.start()
+        return True
+
+    def compact(self, data):
+        """Синхронно пересобирает снимок (для полной перезаписи)"""
+        if self.compaction is not None:
+            self.compaction.join()
+        self.write_snapshot(self.rotate(data))
+
+    def rotate(self, data):
+        """Закрывает текущий журнал и фиксирует копию данных для снимка"""
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if os.path.exists(self.journal_path):
+                if os.path.exists(self.rotated_path):
+                    # Прошлый снимок не записался и его журнал еще нужен:
+                    # текущий журнал дописывается к нему, а не заменяет его
+                    self.append_rotated()
+                else:
+                    os.replace(self.journal_path, self.rotated_path)
+            if isinstance(data, CompactDays):
+                # Только ссылки на неизменяемые записи; в словари их переводит поток сжатия
+                return data.frozen()
+            # Записи дней заменяются целиком, поэтому достаточно копий словарей
+            return {date_str: dict(day_data) for date_str, day_data in data.items()}
+
+    def append_rotated(self):
+        """Переносит текущий журнал в конец .journal.old"""
+        with open(self.journal_path, 'rb') as f:
+            chunk = f.read()
+        with open(self.rotated_path, 'a+b') as f:
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # Отделяем оборванную строку, чтобы не склеить записи
+                    chunk = b'\n' + chunk
+            f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        # Если процесс прервется здесь, записи журнала применятся дважды - это безопасно
+        os.remove(self.journal_path)
+
+    def write_snapshot(self, snapshot):
+        """Пишет снимок во временный файл и атомарно подменяет им основной"""
+        if isinstance(snapshot, FrozenDays):
+            snapshot = snapshot.to_dict()
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.binary.write(snapshot, self.binary.source_stat())
+            if os.path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+        except OSError as e:
+            # Журнал .old остается на месте и будет применен при загрузке
+            Logger.error('Storage: не удалось записать снимок %s: %s', self.path, e)
+
+    def close(self):
+        """Дожидается сжатия и закрывает журнал"""
+        if self.compaction is not None:
+            self.compaction.join()
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+
+class SqliteStore:
+    """Хранилище в SQLite: одна таблица дней с индексом по дате
+
+    Данные не загружаются целиком: календарь запрашивает только видимый
+    месяц, список заметок - только дни с заметками.
+    """
+    lazy = True
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS days (
+            date TEXT PRIMARY KEY,
+            color TEXT,
+            note TEXT NOT NULL DEFAULT '',
+            last_modified TEXT
+        );
+        CREATE INDEX IF NOT EXISTS days_with_notes ON days(date) WHERE note != '';
+    '''
+    UPSERT = 'INSERT OR REPLACE INTO days (date, color, note, last_modified) VALUES (?, ?, ?, ?)'
+    COLUMNS = 'SELECT date, color, note, last_modified FROM days'
+
+    def __init__(self, path='calendar_data.db'):
+        self.path = path
+        # Запись может идти из фонового потока, доступ защищен блокировкой
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def to_row(date_str, day_data):
+        """Преобразует словарь дня в строку таблицы"""
+        color = day_data.get('color')
+        if color is not None and not isinstance(color, str):
+            color = json.dumps(color)
+        return (date_str, color, day_data.get('note', ''), day_data.get('last_modified'))
+
+    @staticmethod
+    def from_row(row):
+        """Преобразует строку таблицы в словарь дня"""
+        date_str, color, note, last_modified = row
+        day_data = {'note': note}
+        if color is not None:
+            day_data['color'] = json.loads(color) if color.startswith('[') else color
+        if last_modified is not None:
+            day_data['last_modified'] = last_modified
+        return date_str, day_data
+
+    def query(self, sql, params=()):
+        """Выполняет запрос и возвращает словари дней"""
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self.from_row(row) for row in rows]
+
+    def load(self):
+        """Ничего не загружает заранее"""
+        return {}
+
+    def month(self, year, month):
+        """Дни месяца одним запросом по диапазону ключа"""
+        prefix = f"{year:04d}-{month:02d}-"
+        return dict(self.query(
+            self.COLUMNS + ' WHERE date >= ? AND date <= ?',
+            (prefix + '01', prefix + '31')
+        ))
+
+    def get(self, date_str):
+        """Данные одного дня"""
+        rows = self.query(self.COLUMNS + ' WHERE date = ?', (date_str,))
+        return rows[0][1] if rows else None
+
+    def notes(self):
+        """Дни с заметками, новые сначала"""
+        return self.query(self.COLUMNS + " WHERE note != '' ORDER BY date DESC")
+
+    def put(self, date_str, day_data):
+        """Записывает данные дня"""
+        self.put_many([(date_str, day_data)])
+
+    def put_many(self, items):
+        """Записывает несколько дней в одной транзакции"""
+        rows = [self.to_row(date_str, day_data) for date_str, day_data in items]
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(self.UPSERT, rows)
+
+    def delete(self, date_str):
+        """Удаляет день"""
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM days WHERE date = ?', (date_str,))
+
+    def apply_batch(self, changes):
+        """Записывает пакет изменений в одной транзакции"""
+        rows = [self.to_row(date_str, day_data) for date_str, day_data in changes if day_data is not None]
+        deleted = [(date_str,) for date_str, day_data in changes if day_data is None]
+        with self.lock, self.conn:
+            self.conn.executemany(self.UPSERT, rows)
+            self.conn.executemany('DELETE FROM days WHERE date = ?', deleted)
+
+    def maybe_compact(self, data):
+        """SQLite не требует сжатия журнала"""
+        return False
+
+    def compact(self, data):
+        """Записывает переданные дни одной транзакцией"""
+        self.put_many(data.items())
+
+    def import_json_once(self, json_path):
+        """Однократно переносит данные из calendar_data.json"""
+        with self.lock:
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= 1:
+            return 0
+        data = JournalStore(json_path).load() if os.path.exists(json_path) else {}
+        rows = [self.to_row(date_str, day_data) for date_str, day_data in data.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(self.UPSERT, rows)
+            self.conn.execute('PRAGMA user_version = 1')
+        Logger.info('Storage: импортировано %d дней из %s', len(rows), json_path)
+        return len(rows)
+
+    def close(self):
+        """Закрывает соединение"""
+        with self.lock:
+            self.conn.close()
+
+
+class PersistenceWorker:
+    """Фоновая запись изменений с объединением близких по времени правок
+
+    Интерфейс только помечает дни как измененные. Поток ждет delay секунд
+    после первой пометки и пишет все накопленные дни одним пакетом; повторные
+    правки одного дня схлопываются в одну запись.
+
+    Пакет, который не удалось записать, возвращается в очередь (более новые
+    правки тех же дней остаются) и повторяется с растущей паузой; on_error
+    вызывается из фонового потока с числом дней и ошибкой.
+    """
+    # Пауза перед повтором после первой неудачи и ее предел
+    RETRY_DELAY = 1
+    MAX_RETRY_DELAY = 60
+
+    def __init__(self, store, delay=0.5, on_error=None):
+        self.store = store
+        self.delay = delay
+        self.on_error = on_error
+        self.cond = threading.Condition()
+        self.pending = {}
+        # Пакет, который сейчас пишется: до конца записи его нет в хранилище
+        self.in_flight = {}
+        self.first_dirty = 0
+        # Неудачные записи подряд и время следующей попытки
+        self.failures = 0
+        self.retry_at = 0
+        self.writing = False
+        self.flushing = False
+        self.stopping = False
+        self.thread = None
+        # Вызываются после записи всех изменений, поставленных до них
+        self.after_write = []
+        # Счетчики: запросы, влитые в уже ожидающий пакет, и реальные записи
+        self.coalesced = 0
+        self.writes = 0
+
+    def schedule(self, changes):
+        """Помечает дни как измененные: словарь дата -> данные или None"""
+        with self.cond:
+            if self.pending:
+                self.coalesced += 1
+            else:
+                self.first_dirty = time.monotonic()
+            self.pending.update(changes)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='persistence', daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def run(self):
+        """Цикл фонового потока"""
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopping:
+                    self.cond.wait()
+                if not self.pending or (self.stopping and self.failures):
+                    if self.pending:
+                        Logger.error('Storage: при выходе не сохранено дней: %d', len(self.pending))
+                    return
+                # Ждем окончания окна объединения (при сбросе - только паузы
+                # перед повтором) или остановки
+                while not self.stopping:
+                    ready = self.retry_at if self.flushing else max(self.first_dirty + self.delay, self.retry_at)
+                    remaining = ready - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = list(self.pending.items())
+                self.in_flight, self.pending = self.pending, {}
+                self.writing = True
+            written = False
+            error = None
+            try:
+                # Записи дней превращаются в словари JSON здесь, а не в главном потоке
+                self.store.apply_batch([
+                    (date_str, day_data.to_dict() if isinstance(day_data, DayRecord) else day_data)
+                    for date_str, day_data in batch
+                ])
+                written = True
+            except (OSError, sqlite3.Error) as e:
+                error = e
+                Logger.error('Storage: не удалось сохранить %d дней: %s', len(batch), e)
+            finally:
+                with self.cond:
+                    if written:
+                        self.writes += 1
+                        self.failures = 0
+                        self.retry_at = 0
+                    else:
+                        # Правки, сделанные во время записи, новее пакета
+                        for date_str, day_data in self.in_flight.items():
+                            self.pending.setdefault(date_str, day_data)
+                        self.failures += 1
+                        self.retry_at = time.monotonic() + min(
+                            self.RETRY_DELAY * 2 ** (self.failures - 1), self.MAX_RETRY_DELAY)
+                    self.writing = False
+                    self.in_flight = {}
+                    self.cond.notify_all()
+            if error is not None and self.on_error is not None:
+                self.on_error(len(batch), error)
+            if written:
+                with self.cond:
+                    callbacks = [] if self.pending else self.after_write
+                    if callbacks:
+                        self.after_write = []
+                for callback in callbacks:
+                    callback()
+
+    def when_written(self, callback):
+        """Вызывает callback, когда все уже поставленные изменения записаны
+
+        Если записывать нечего, вызов происходит сразу; иначе - из фонового
+        потока после успешной записи.
+        """
+        with self.cond:
+            if self.pending or self.writing:
+                self.after_write.append(callback)
+                return
+        callback()
+
+    def unwritten(self, prefix=''):
+        """Изменения дат с префиксом, еще не попавшие в хранилище: дата -> данные или None
+
+        Чтение хранилища должно идти после этого вызова: тогда изменение,
+        записанное в промежутке, будет и в ответе хранилища, и здесь.
+        """
+        with self.cond:
+            changes = dict(self.in_flight)
+            changes.update(self.pending)
+        return {date_str: day_data for date_str, day_data in changes.items() if date_str.startswith(prefix)}
+
+    def flush(self):
+        """Синхронно дописывает все ожидающие изменения
+
+        Делает одну попытку без паузы перед повтором; если запись не удалась
+        или поток записи завершился, изменения остаются в очереди.
+        """
+        with self.cond:
+            failures = self.failures
+            self.flushing = True
+            self.retry_at = 0
+            self.cond.notify_all()
+            while (self.pending or self.writing) and self.failures == failures:
+                if self.thread is None or not self.thread.is_alive():
+                    break
+                self.cond.wait(0.1)
+            self.flushing = False
+
+    def stop(self):
+        """Сбрасывает изменения и завершает поток"""
+        self.flush()
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self):
+        """Счетчики объединенных и выполненных записей"""
+        with self.cond:
+            return {'coalesced': self.coalesced, 'writes': self.writes, 'pending': len(self.pending)}
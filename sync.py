@@ -0,0 +1,296 @@
+"""Синхронизация дней между устройствами по last_modified
+
+Клиент отправляет только дни, измененные с прошлой синхронизации, и
+забирает с сервера изменения после своего курсора. Тела запросов - JSON,
+сжатый gzip; большие наборы передаются пакетами. Из двух версий дня
+побеждает более поздняя по last_modified, удаления передаются как
+"надгробия" (data = None) со временем удаления.
+
+Для проверки без сети есть локальный сервер-заглушка:
+
+    python sync.py --port 8765
+    CALENDAR_SYNC_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import threading
+import urllib.request
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+Logger = logging.getLogger('calendar.sync')
+
+
+def encode(payload):
+    """JSON, сжатый gzip"""
+    return gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode(body):
+    """Обратное к encode"""
+    return json.loads(gzip.decompress(body).decode('utf-8'))
+
+
+def is_newer(change, current_modified):
+    """Побеждает ли изменение версию с временем current_modified"""
+    return (change['last_modified'] or '') > (current_modified or '')
+
+
+class SyncState:
+    """Состояние сервера: последняя версия каждого дня и номер изменения
+
+    Номер (seq) растет с каждым принятым изменением; курсор клиента - это
+    последний номер, который он уже получил.
+    """
+    def __init__(self):
+        self.entries = {}
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def push(self, device, changes):
+        """Принимает изменения устройства; отклоненные возвращает с версией сервера"""
+        rejected = []
+        with self.lock:
+            for change in changes:
+                current = self.entries.get(change['date'])
+                if current is not None and not is_newer(change, current['last_modified']):
+                    rejected.append(self.change(change['date'], current))
+                    continue
+                self.seq += 1
+                self.entries[change['date']] = {
+                    'data': change['data'],
+                    'last_modified': change['last_modified'],
+                    'seq': self.seq,
+                    'device': device
+                }
+        return {'accepted': len(changes) - len(rejected), 'rejected': rejected}
+
+    def pull(self, device, since, limit):
+        """Изменения других устройств после курсора since, не больше limit"""
+        with self.lock:
+            newer = sorted(
+                (entry['seq'], date_str) for date_str, entry in self.entries.items()
+                if entry['seq'] > since
+            )
+            page = newer[:limit]
+            changes = [
+                self.change(date_str, self.entries[date_str]) for seq, date_str in page
+                if self.entries[date_str]['device'] != device
+            ]
+            cursor = page[-1][0] if page else max(since, 0)
+            return {'changes': changes, 'cursor': cursor, 'more': len(newer) > limit}
+
+    @staticmethod
+    def change(date_str, entry):
+        return {'date': date_str, 'data': entry['data'], 'last_modified': entry['last_modified']}
+
+
+class SyncHandler(BaseHTTPRequestHandler):
+    """HTTP-обработчик сервера-заглушки: POST /push и POST /pull"""
+    state = None
+
+    def do_POST(self):
+        try:
+            request = decode(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if self.path == '/push':
+                response = self.state.push(request['device'], request['changes'])
+            elif self.path == '/pull':
+                response = self.state.pull(request['device'], request['since'], request['limit'])
+            else:
+                self.send_error(404)
+                return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+        body = encode(response)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        Logger.debug('Sync server: ' + format, *args)
+
+
+def make_server(host='127.0.0.1', port=8765):
+    """Сервер-заглушка с пустым состоянием в памяти"""
+    handler = type('BoundSyncHandler', (SyncHandler,), {'state': SyncState()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class SyncClient:
+    """Клиент синхронизации: список измененных дней, курсор и фоновый обмен
+
+    Состояние (идентификатор устройства, курсор, еще не отправленные дни)
+    хранится в calendar_sync.json, чтобы изменения, сделанные без сети,
+    ушли при следующей синхронизации.
+    """
+    def __init__(self, url, state_path='calendar_sync.json', batch_size=500, timeout=15):
+        self.url = url.rstrip('/')
+        self.state_path = state_path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # Состояние пишут и главный поток, и поток синхронизации
+        self.save_lock = threading.Lock()
+        self.thread = None
+        self.device = uuid.uuid4().hex
+        self.cursor = 0
+        # Дата -> время изменения (для удалений это время "надгробия")
+        self.dirty = {}
+        # Изменения, взятые в текущий обмен, но еще не принятые сервером
+        self.in_flight = []
+        self.load_state()
+
+    def load_state(self):
+        """Читает состояние клиента"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.device = state['device']
+            self.cursor = state['cursor']
+            self.dirty = state['dirty']
+        except (OSError, ValueError, KeyError) as e:
+            Logger.error('Sync: не удалось прочитать %s: %s', self.state_path, e)
+
+    def save_state(self):
+        """Атомарно записывает состояние клиента
+
+        Отправляемые сейчас дни сохраняются вместе с отмеченными: если
+        процесс завершится до ответа сервера, они уйдут в следующий раз.
+        """
+        with self.save_lock:
+            with self.lock:
+                dirty = {change['date']: change['last_modified'] for change in self.in_flight}
+                dirty.update(self.dirty)
+                state = {'device': self.device, 'cursor': self.cursor, 'dirty': dirty}
+            tmp_path = self.state_path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                Logger.error('Sync: не удалось записать %s: %s', self.state_path, e)
+
+    def mark_dirty(self, date_strs):
+        """Отмечает дни, измененные на этом устройстве"""
+        now = datetime.now().isoformat()
+        with self.lock:
+            for date_str in date_strs:
+                self.dirty[date_str] = now
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def take_changes(self, get_day):
+        """Забирает отмеченные дни в исходящий набор (вызывается в главном потоке)"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+        changes = []
+        for date_str, marked_at in dirty.items():
+            day_data = get_day(date_str)
+            if day_data:
+                changes.append({'date': date_str, 'data': day_data,
+                                'last_modified': day_data.get('last_modified', marked_at)})
+            else:
+                changes.append({'date': date_str, 'data': None, 'last_modified': marked_at})
+        with self.lock:
+            self.in_flight = changes
+        return changes
+
+    def restore_changes(self, changes):
+        """Возвращает неотправленные дни в список (более новые отметки не трогает)"""
+        with self.lock:
+            for change in changes:
+                self.dirty.setdefault(change['date'], change['last_modified'])
+            self.in_flight = []
+
+    def post(self, path, payload):
+        """Один сжатый запрос к серверу"""
+        request = urllib.request.Request(
+            self.url + path, data=encode(payload), method='POST',
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return decode(response.read())
+
+    def sync(self, changes):
+        """Отправляет изменения пакетами и забирает чужие
+
+        Возвращает входящие изменения и новый курсор. Курсор не сохраняется
+        здесь: вызывающий передает его в commit_cursor, когда входящие
+        изменения применены и записаны, иначе при сбое они потеряются.
+        """
+        incoming = []
+        sent = 0
+        cursor = self.cursor
+        try:
+            for start in range(0, len(changes), self.batch_size):
+                result = self.post('/push', {'device': self.device, 'changes': changes[start:start + self.batch_size]})
+                # Отклоненные дни новее на сервере - их версия приходит обратно
+                incoming.extend(result['rejected'])
+                sent = start + self.batch_size
+                with self.lock:
+                    self.in_flight = changes[sent:]
+            more = True
+            while more:
+                result = self.post('/pull', {'device': self.device, 'since': cursor, 'limit': self.batch_size})
+                incoming.extend(result['changes'])
+                cursor = result['cursor']
+                more = result['more']
+        except (OSError, ValueError, KeyError) as e:
+            self.restore_changes(changes[sent:])
+            self.save_state()
+            raise ConnectionError(f'синхронизация прервана: {e}') from e
+        self.save_state()
+        Logger.info('Sync: отправлено %d, получено %d', len(changes), len(incoming))
+        return incoming, cursor
+
+    def commit_cursor(self, cursor):
+        """Сохраняет курсор, до которого входящие изменения уже записаны
+
+        Может вызываться из любого потока; курсор только растет.
+        """
+        with self.lock:
+            self.cursor = max(self.cursor, cursor)
+        self.save_state()
+
+    def sync_in_background(self, changes, on_done, on_error):
+        """Запускает sync в фоновом потоке; колбэки вызываются из него же"""
+        def run():
+            try:
+                incoming, cursor = self.sync(changes)
+            except ConnectionError as e:
+                on_error(e)
+                return
+            on_done(incoming, cursor)
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный сервер синхронизации календаря')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.host, args.port)
+    Logger.info('Sync server: http://%s:%d', args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
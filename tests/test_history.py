@@ -0,0 +1,60 @@
+from history import History, HistoryEntry
+from records import DayRecord
+
+
+def record(note):
+    return DayRecord.from_dict({'color': '#FF6B6B', 'note': note})
+
+
+def days(*dates, note='заметка'):
+    return {date_str: (record(note), None) for date_str in dates}
+
+
+def test_undo_and_redo_move_entries_between_stacks():
+    history = History()
+    history.record('первая', days('2024-01-01'))
+    history.record('вторая', days('2024-01-02'))
+
+    assert history.undo().label == 'вторая'
+    assert history.can_redo()
+    assert history.redo().label == 'вторая'
+    assert history.undo().label == 'вторая'
+
+    # Новая операция отбрасывает отмененные
+    history.record('третья', days('2024-01-03'))
+    assert not history.can_redo()
+    assert [entry.label for entry in history.undo_stack] == ['первая', 'третья']
+    assert history.size == sum(entry.size for entry in history.undo_stack)
+
+
+def test_oldest_entries_are_evicted_by_size():
+    entry_size = HistoryEntry(None, days('2024-01-01'), {}).size
+    history = History(limit_bytes=entry_size * 3)
+    for day in range(1, 6):
+        assert history.record(f'день {day}', days(f'2024-01-{day:02d}'))
+
+    assert [entry.label for entry in history.undo_stack] == ['день 3', 'день 4', 'день 5']
+    assert history.size <= history.limit_bytes
+
+
+def test_oversized_entry_is_not_recorded_and_keeps_history():
+    entry_size = HistoryEntry(None, days('2024-01-01'), {}).size
+    history = History(limit_bytes=entry_size * 3)
+    history.record('маленькая', days('2024-01-01'))
+    history.record('отмененная', days('2024-01-02'))
+    history.undo()
+    bulk = days(*(f'2024-02-{day:02d}' for day in range(1, 29)), note='x' * 1000)
+
+    assert not history.fits(bulk)
+    assert not history.record('очистка заметок', bulk)
+
+    # Прежняя операция по-прежнему отменяется, повтор отмененной - нет
+    assert [entry.label for entry in history.undo_stack] == ['маленькая']
+    assert not history.can_redo()
+    assert history.size == entry_size
+
+
+def test_entry_size_counts_note_text():
+    short = HistoryEntry(None, days('2024-01-01', note='a'), {}).size
+    long = HistoryEntry(None, days('2024-01-01', note='a' * 10000), {}).size
+    assert long - short >= 9999
@@ -0,0 +1,158 @@
+from datetime import date, timedelta
+
+from indexes import MonthStats, NoteFilterIndex, NoteSearchIndex, NotesIndex, has_note
+
+
+def note(text, color='#FF6B6B'):
+    return {'color': color, 'note': text}
+
+
+def test_has_note_ignores_blank_and_non_text():
+    assert has_note(note('текст'))
+    assert not has_note(note('  \n'))
+    assert not has_note({'color': '#FF6B6B'})
+    assert not has_note({'note': ['не строка']})
+
+
+def test_notes_index_keeps_dates_sorted():
+    index = NotesIndex()
+    index.build({'2024-03-01': note('c'), '2024-01-01': note('a'), '2024-02-01': note('')})
+    assert index.dates == ['2024-01-01', '2024-03-01']
+
+    index.set('2024-02-01', note('b'))
+    index.set('2024-02-01', note('b2'))
+    index.set('2024-03-01', note(''))
+    index.remove('2024-12-31')
+
+    assert index.dates == ['2024-01-01', '2024-02-01']
+    assert list(index.newest_first()) == ['2024-02-01', '2024-01-01']
+
+
+def test_notes_index_bulk_update_matches_single_updates():
+    data = {f'2024-01-{day:02d}': note(str(day)) for day in range(1, 31, 2)}
+    bulk = NotesIndex()
+    bulk.build(data)
+    single = NotesIndex()
+    single.build(data)
+    changed = {f'2024-01-{day:02d}': note('' if day % 3 else 'новая') for day in range(1, 31)}
+
+    for date_str, day_data in changed.items():
+        single.set(date_str, day_data)
+    bulk.update(changed, [date_str for date_str, day_data in changed.items() if has_note(day_data)])
+
+    assert bulk.dates == single.dates
+
+
+def test_search_matches_all_words_by_prefix():
+    index = NoteSearchIndex()
+    index.build([
+        ('2024-01-01', 'Купить молоко и хлеб'),
+        ('2024-01-02', 'Молочный коктейль'),
+        ('2024-01-03', 'ёлка на площади'),
+    ])
+
+    assert index.search('МОЛ') == ['2024-01-02', '2024-01-01']
+    assert index.search('мол хлеб') == ['2024-01-01']
+    assert index.search('елка') == ['2024-01-03']
+    # Короткий префикс ищется только как целое слово
+    assert index.search('на') == ['2024-01-03']
+    assert index.search('мо') == []
+    assert index.search('молоко сыр') == []
+
+
+def test_search_ranks_exact_words_above_prefixes():
+    index = NoteSearchIndex()
+    index.build([('2024-01-01', 'кот'), ('2024-01-02', 'котлета'), ('2024-01-03', 'котлета')])
+
+    assert index.search('кот') == ['2024-01-01', '2024-01-03', '2024-01-02']
+
+
+def test_search_returns_every_match_unless_limited():
+    days = [(date(2023, 1, 1) + timedelta(days=n)).isoformat() for n in range(500)]
+    index = NoteSearchIndex()
+    index.build((date_str, 'встреча встреча' if n % 2 == 0 else 'встреча') for n, date_str in enumerate(days))
+
+    found = index.search('встреча')
+    assert len(found) == 500
+    # Сначала заметки с двумя вхождениями, при равном весе новые выше
+    assert found[:2] == [days[498], days[496]]
+    assert found[-1] == days[1]
+    assert index.search('встреча', limit=3) == found[:3]
+
+
+def test_prefix_expansion_stops_at_last_matching_word():
+    index = NoteSearchIndex()
+    index.build([('2024-01-01', 'кот котлета котя кошка кп котёл')])
+
+    assert index.expand('кот') == ['кот', 'котел', 'котлета', 'котя']
+    assert index.expand('котя') == ['котя']
+    assert index.expand('котяра') == []
+
+
+def test_search_index_follows_edits():
+    index = NoteSearchIndex()
+    index.build([('2024-01-01', 'старый текст')])
+
+    index.set('2024-01-01', 'новый текст')
+    index.set('2024-01-02', 'новость')
+    index.remove('2024-01-03')
+
+    assert index.search('стар') == []
+    assert index.search('нов') == ['2024-01-02', '2024-01-01']
+    index.remove('2024-01-02')
+    assert index.vocabulary == ['новый', 'текст']
+
+
+def test_month_stats_are_recounted_only_after_invalidation():
+    data = {'2024-01-01': note('a'), '2024-01-02': {'color': '#FF6B6B'}, '2024-01-03': note('', color=[1, 0, 0, 1])}
+    loads = []
+
+    def load_month(year, month):
+        loads.append((year, month))
+        return {key: value for key, value in data.items() if key.startswith(f'{year:04d}-{month:02d}')}
+
+    stats = MonthStats()
+    summary = stats.month(2024, 1, load_month, 31)
+    assert (summary.colored, summary.notes) == (3, 1)
+    assert summary.colors == {'#FF6B6B': 2, (1, 0, 0, 1): 1}
+    assert summary.day_colors[:4] == ['#FF6B6B', '#FF6B6B', (1, 0, 0, 1), None]
+
+    data['2024-01-04'] = note('b')
+    assert stats.month(2024, 1, load_month, 31) is summary
+    stats.invalidate(['2024-01-04', '2024-05-01'])
+    assert stats.month(2024, 1, load_month, 31).notes == 2
+    assert loads == [(2024, 1), (2024, 1)]
+
+
+def test_filter_index_by_colour_and_range():
+    index = NoteFilterIndex()
+    index.build([
+        ('2024-03-01', note('c', color='#4ecdc4')),
+        ('2024-01-01', note('a')),
+        ('2024-02-01', note('b', color=[1, 0, 0, 1])),
+        ('2024-02-15', note('', color='#4ECDC4')),
+    ])
+
+    assert index.query() == ['2024-01-01', '2024-02-01', '2024-03-01']
+    # HEX сравнивается без учета регистра
+    assert index.query('#4ECDC4') == ['2024-03-01']
+    assert index.query([1, 0, 0, 1], start='2024-01-15') == ['2024-02-01']
+    assert index.query(start='2024-01-02', end='2024-02-28') == ['2024-02-01']
+    assert index.query('#000000') == []
+    assert index.matches('2024-03-01', color='#4ecdc4', end='2024-03-01')
+    assert not index.matches('2024-02-15')
+
+
+def test_filter_index_follows_colour_changes():
+    index = NoteFilterIndex()
+    index.build([('2024-01-01', note('a'))])
+
+    index.set('2024-01-01', note('a', color='#4ECDC4'))
+    index.set('2024-01-02', note('b'))
+    index.set('2024-01-03', None)
+
+    assert index.query('#FF6B6B') == ['2024-01-02']
+    assert index.query('#4ECDC4') == ['2024-01-01']
+    index.remove('2024-01-01')
+    assert '#4ECDC4' not in index.colors
+    assert index.query() == ['2024-01-02']
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from records import CompactDays
+from storage import JournalStore
+
+
+def day(note, color='#FF6B6B', modified='2024-01-01T10:00:00'):
+    return {'color': color, 'note': note, 'last_modified': modified}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / 'calendar_data.json'), compact_threshold=1 << 30)
+    yield store
+    store.close()
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_replay_applies_puts_and_deletes_over_snapshot(store):
+    write_json(store.path, {'2024-01-01': day('a'), '2024-01-02': day('b')})
+    store.put('2024-01-02', day('b2'))
+    store.delete('2024-01-01')
+    store.apply_batch([('2024-02-03', day('c')), ('2024-01-02', None), ('2024-01-02', day('b3'))])
+
+    assert store.load() == {'2024-01-02': day('b3'), '2024-02-03': day('c')}
+    assert store.load_month(2024, 1) == {'2024-01-02': day('b3')}
+
+
+def test_torn_last_line_is_skipped_and_separated(store):
+    store.put('2024-01-01', day('a'))
+    store.close()
+    with open(store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op":"put","date":"2024-01-0')
+
+    assert store.load() == {'2024-01-01': day('a')}
+
+    # Следующая запись не склеивается с оборванной строкой
+    store.put('2024-01-03', day('c'))
+    assert store.load() == {'2024-01-01': day('a'), '2024-01-03': day('c')}
+
+
+def test_compaction_replaces_snapshot_and_removes_journals(store):
+    write_json(store.path, {'2024-01-01': day('a')})
+    store.put('2024-01-02', day('b'))
+    data = CompactDays(store.load())
+    store.compact_threshold = 0
+
+    assert store.maybe_compact(data)
+    store.compaction.join()
+
+    assert not os.path.exists(store.journal_path)
+    assert not os.path.exists(store.rotated_path)
+    with open(store.path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'2024-01-01': day('a'), '2024-01-02': day('b')}
+    assert store.load() == {'2024-01-01': day('a'), '2024-01-02': day('b')}
+
+
+def test_failed_snapshot_keeps_rotated_journal(store, monkeypatch):
+    store.put('2024-01-01', day('a'))
+
+    def fail(fd):
+        raise OSError('диск переполнен')
+
+    monkeypatch.setattr(os, 'fsync', fail)
+    store.compact({'2024-01-01': day('a')})
+    monkeypatch.undo()
+
+    assert os.path.exists(store.rotated_path)
+    assert store.load() == {'2024-01-01': day('a')}
+
+
+def test_rotate_appends_to_leftover_rotated_journal(store):
+    # .journal.old остался от неудачного сжатия, после него появились новые записи
+    store.put('2024-01-01', day('a'))
+    store.rotate({})
+    store.put('2024-01-02', day('b'))
+    with open(store.rotated_path, 'ab') as f:
+        f.write(b'{"op":"put"')
+
+    store.rotate({})
+
+    assert not os.path.exists(store.journal_path)
+    assert store.load() == {'2024-01-01': day('a'), '2024-01-02': day('b')}
+
+
+def test_snapshot_is_parsed_like_json_and_corrupt_one_is_set_aside(store):
+    data = {'2024-01-01': day('кавычки " и скобки }{'), '2024-01-02': {'color': [1, 0, 0, 1], 'note': ''}}
+    with open(store.path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    assert store.load() == data
+
+    with open(store.path, 'w', encoding='utf-8') as f:
+        f.write('{"2024-01-01": {"note": "a"}, "2024-01-02": ')
+    assert store.load() == {}
+    assert os.path.exists(store.path + '.corrupt')
@@ -0,0 +1,93 @@
+import pytest
+
+from storage import JournalStore, PersistenceWorker
+
+
+def day(note, color='#FF6B6B', modified='2024-01-01T10:00:00'):
+    return {'color': color, 'note': note, 'last_modified': modified}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JournalStore(str(tmp_path / 'calendar_data.json'), compact_threshold=1 << 30)
+    yield store
+    store.close()
+
+
+
+def test_worker_coalesces_and_reports_unwritten(store):
+    worker = PersistenceWorker(store, delay=60)
+    worker.schedule({'2024-01-01': day('a')})
+    worker.schedule({'2024-01-01': day('a2'), '2024-02-01': None})
+
+    assert worker.unwritten('2024-01-') == {'2024-01-01': day('a2')}
+
+    worker.stop()
+    assert worker.unwritten() == {}
+    assert worker.stats() == {'coalesced': 1, 'writes': 1, 'pending': 0}
+    assert store.load() == {'2024-01-01': day('a2')}
+
+
+class FlakyStore:
+    """Хранилище, запись в которое не удается, пока задана ошибка"""
+    def __init__(self, store):
+        self.store = store
+        self.error = None
+        self.during_write = None
+
+    def apply_batch(self, batch):
+        if self.during_write is not None:
+            self.during_write()
+            self.during_write = None
+        if self.error is not None:
+            raise self.error
+        self.store.apply_batch(batch)
+
+
+def test_worker_keeps_failed_batch_and_newer_edits(store):
+    flaky = FlakyStore(store)
+    errors = []
+    worker = PersistenceWorker(flaky, delay=60, on_error=lambda count, error: errors.append(count))
+    flaky.error = OSError('диск переполнен')
+    # Правка того же дня, сделанная во время неудачной записи, новее пакета
+    flaky.during_write = lambda: worker.schedule({'2024-01-01': day('a2')})
+    worker.schedule({'2024-01-01': day('a'), '2024-01-02': day('b')})
+
+    worker.flush()
+    assert errors == [2]
+    assert worker.unwritten() == {'2024-01-01': day('a2'), '2024-01-02': day('b')}
+
+    flaky.error = None
+    worker.stop()
+    assert worker.unwritten() == {}
+    assert store.load() == {'2024-01-01': day('a2'), '2024-01-02': day('b')}
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_flush_returns_when_writer_thread_died(store):
+    flaky = FlakyStore(store)
+    flaky.error = RuntimeError('сбой')
+    worker = PersistenceWorker(flaky, delay=60)
+    worker.schedule({'2024-01-01': day('a')})
+
+    worker.flush()
+    worker.thread.join()
+    assert worker.unwritten() == {'2024-01-01': day('a')}
+
+    # Следующая правка запускает новый поток
+    flaky.error = None
+    worker.schedule({'2024-01-02': day('b')})
+    worker.stop()
+    assert store.load() == {'2024-01-01': day('a'), '2024-01-02': day('b')}
+
+
+def test_when_written_waits_for_scheduled_changes(store):
+    worker = PersistenceWorker(store, delay=60)
+    calls = []
+    worker.when_written(lambda: calls.append('сразу'))
+    worker.schedule({'2024-01-01': day('a')})
+    worker.when_written(lambda: calls.append(store.load()))
+    assert calls == ['сразу']
+
+    worker.stop()
+    assert calls == ['сразу', {'2024-01-01': day('a')}]
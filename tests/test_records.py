@@ -0,0 +1,68 @@
+from records import CompactDays, DayRecord
+
+
+def day(note, color='#FF6B6B', modified='2024-01-01T10:00:00'):
+    return {'color': color, 'note': note, 'last_modified': modified}
+
+
+def test_apply_returns_versions_and_keeps_order():
+    data = CompactDays({f'2024-01-{n:02d}': day(str(n)) for n in range(1, 31)})
+    before = data['2024-01-05']
+    changes = {f'2024-01-{n:02d}': None for n in range(10, 30)}
+    changes.update({'2024-01-05': day('новая'), '2023-12-31': day('старый год'), '2024-02-01': None})
+
+    days = data.apply(changes)
+
+    # Удаление отсутствующего дня изменением не считается
+    assert '2024-02-01' not in days
+    assert days['2024-01-05'] == (before, data['2024-01-05'])
+    assert days['2024-01-10'][1] is None
+    assert list(data.month(2024, 1)) == [f'2024-01-{n:02d}' for n in (1, 2, 3, 4, 5, 6, 7, 8, 9, 30)]
+    assert list(data.month(2023, 12)) == ['2023-12-31']
+
+
+def test_edited_replaces_note_and_time_only():
+    record = DayRecord.from_dict({'color': '#FF6B6B', 'note': 'текст', 'last_modified': 'вчера', 'pinned': True})
+    modified = DayRecord.pack_modified('2024-03-01T12:30:00')
+
+    cleared = record.edited(modified, note='')
+
+    assert cleared.to_dict() == {'color': '#FF6B6B', 'note': '', 'last_modified': '2024-03-01T12:30:00', 'pinned': True}
+    assert record.edited(modified).to_dict() == dict(record, last_modified='2024-03-01T12:30:00')
+    assert cleared.to_dict() == dict(cleared)
+
+
+def test_day_record_keeps_unpackable_fields():
+    day_data = {'color': [1, 0, 0, 1], 'note': 'старый', 'last_modified': '2024-01-01T10:00:00+03:00', 'pinned': True}
+    record = DayRecord.from_dict(day_data)
+
+    assert dict(record) == day_data
+    assert record.to_dict() == day_data
+    assert record.get('missing', 'нет') == 'нет'
+    assert 'color' in record and 'rule' not in record
+    assert DayRecord.from_dict({'color': '#FF6B6B'}).color is DayRecord.from_dict({'color': '#FF6B6B'}).color
+
+
+def test_compact_days_behaves_like_dict():
+    data = CompactDays({'2024-02-01': day('b'), '2024-01-15': day('a')})
+    data['2024-01-01'] = day('первый')
+    data['settings'] = {'theme': 'dark'}
+    del data['2024-02-01']
+
+    assert sorted(data) == ['2024-01-01', '2024-01-15', 'settings']
+    assert len(data) == 3
+    assert data['2024-01-15'] == day('a')
+    assert data.get('2024-02-01') is None and '2024-02-01' not in data
+    assert list(data.month(2024, 1)) == ['2024-01-01', '2024-01-15']
+    assert data.frozen().to_dict() == {'2024-01-01': day('первый'), '2024-01-15': day('a'), 'settings': {'theme': 'dark'}}
+
+
+def test_sorted_chunks_survive_edits_between_chunks():
+    data = CompactDays({f'2024-01-{n:02d}': day(str(n)) for n in range(1, 7)})
+    chunks = data.sorted_chunks(2)
+
+    assert [date_str for date_str, record in next(chunks)] == ['2024-01-01', '2024-01-02']
+    del data['2024-01-03']
+    data['2023-12-31'] = day('новый')
+
+    assert [date_str for chunk in chunks for date_str, record in chunk] == ['2024-01-04', '2024-01-05', '2024-01-06']
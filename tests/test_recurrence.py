@@ -0,0 +1,76 @@
+from datetime import date
+
+from recurrence import RecurrenceEngine, expand_rule
+
+
+def rule(freq, start, **fields):
+    return dict({'id': 1, 'freq': freq, 'start': start, 'until': None, 'weekdays': None,
+                 'color': '#FF6B6B', 'note': 'повтор'}, **fields)
+
+
+def test_expand_rule_by_frequency():
+    assert list(expand_rule(rule('daily', '2024-02-27', until='2024-03-02'), 2024, 2)) == [
+        '2024-02-27', '2024-02-28', '2024-02-29']
+    # 2024-01-01 - понедельник
+    assert list(expand_rule(rule('weekly', '2024-01-01', weekdays=[0, 2]), 2024, 1))[:3] == [
+        '2024-01-01', '2024-01-03', '2024-01-08']
+    assert list(expand_rule(rule('monthly', '2024-01-31'), 2024, 2)) == []
+    assert list(expand_rule(rule('monthly', '2024-01-31'), 2024, 3)) == ['2024-03-31']
+    assert list(expand_rule(rule('yearly', '2020-02-29'), 2023, 2)) == []
+    assert list(expand_rule(rule('yearly', '2020-02-29'), 2024, 2)) == ['2024-02-29']
+    assert list(expand_rule(rule('monthly', '2024-05-10'), 2024, 4)) == []
+
+
+def test_rules_persist_and_later_rule_wins(tmp_path):
+    path = str(tmp_path / 'calendar_rules.json')
+    engine = RecurrenceEngine(path)
+    first = engine.add_rule('daily', '2024-01-01', '#FF6B6B', 'каждый день')
+    second = engine.add_rule('weekly', '2024-01-01', '#4ECDC4', 'понедельник', weekdays=[0])
+
+    restored = RecurrenceEngine(path)
+    restored.load()
+    assert restored.rules == engine.rules
+    assert restored.day('2024-01-08') == {'color': '#4ECDC4', 'note': 'понедельник', 'rule': second['id']}
+    assert restored.day('2024-01-09')['rule'] == first['id']
+
+
+def test_rule_changes_reset_memoized_months(tmp_path):
+    engine = RecurrenceEngine(str(tmp_path / 'calendar_rules.json'), memo_size=2)
+    added = engine.add_rule('monthly', '2024-01-15', '#FF6B6B', 'оплата')
+    assert engine.day('2024-02-15') is not None
+
+    engine.remove_rule(added['id'])
+    assert engine.day('2024-02-15') is None
+    engine.restore_rule(added['id'], added)
+    assert engine.day('2024-02-15') is not None
+
+    for month in range(1, 5):
+        engine.month(2024, month)
+    assert list(engine.memo) == [(2024, 3), (2024, 4)]
+
+
+def test_next_occurrence_skips_days_with_own_records(tmp_path):
+    engine = RecurrenceEngine(str(tmp_path / 'calendar_rules.json'))
+    added = engine.add_rule('monthly', '2024-01-31', '#FF6B6B', 'отчет')
+
+    assert engine.next_occurrence(added, date(2024, 2, 1)) == '2024-03-31'
+    assert engine.next_occurrence(added, date(2024, 2, 1), skip={'2024-03-31'}) == '2024-05-31'
+    assert engine.next_occurrence(added, date(2024, 2, 1), horizon_days=30) is None
+
+
+def test_excluded_date_is_skipped_and_restorable(tmp_path):
+    engine = RecurrenceEngine(str(tmp_path / 'calendar_rules.json'))
+    added = engine.add_rule('weekly', '2024-01-01', '#FF6B6B', 'планерка', weekdays=[0, 3])
+
+    before, after = engine.exclude_date(added['id'], '2024-01-04')
+
+    assert before is added and before['exdates'] == []
+    assert after['exdates'] == ['2024-01-04']
+    assert sorted(engine.month(2024, 1))[:3] == ['2024-01-01', '2024-01-08', '2024-01-11']
+    assert engine.exclude_date(99, '2024-01-04') is None
+
+    # Отмена возвращает прежнюю версию правила вместе с датой
+    engine.restore_rule(added['id'], before)
+    assert engine.day('2024-01-04') is not None
+    # Правило из старого файла без списка исключений раскрывается как раньше
+    assert list(expand_rule(rule('monthly', '2024-01-04'), 2024, 2)) == ['2024-02-04']
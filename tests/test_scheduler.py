@@ -0,0 +1,58 @@
+import time
+
+from kivy.clock import Clock
+
+from scheduler import FrameScheduler
+
+
+def counting_steps(total, log):
+    for done in range(1, total + 1):
+        log.append(done)
+        # Шаг дольше бюджета: за кадр выполняется ровно один
+        time.sleep(0.002)
+        yield done, total
+
+
+def test_first_step_runs_at_once_and_rest_on_frames():
+    jobs = FrameScheduler(budget=0.001)
+    log, progress, done = [], [], []
+    jobs.run('build', counting_steps(3, log), on_progress=lambda *step: progress.append(step),
+             on_done=lambda: done.append(True))
+
+    assert log == [1] and jobs.running('build')
+    for frame in range(5):
+        Clock.tick()
+
+    assert log == [1, 2, 3]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+    assert done == [True]
+    assert not jobs.active
+
+
+def test_run_with_same_name_cancels_previous_job():
+    jobs = FrameScheduler(budget=0.001)
+    first, second = [], []
+    jobs.run('search', counting_steps(5, first))
+    jobs.run('search', counting_steps(2, second))
+    for frame in range(5):
+        Clock.tick()
+
+    assert first == [1]
+    assert second == [1, 2]
+
+
+def test_cancel_and_finish():
+    jobs = FrameScheduler(budget=0.001)
+    cancelled, finished, done = [], [], []
+    jobs.run('prepare', counting_steps(5, cancelled), on_done=lambda: done.append('prepare'))
+    jobs.run('apply', counting_steps(5, finished), on_done=lambda: done.append('apply'))
+
+    jobs.cancel('prepare')
+    jobs.finish('apply')
+    jobs.finish('missing')
+    Clock.tick()
+
+    assert cancelled == [1]
+    assert finished == [1, 2, 3, 4, 5]
+    assert done == ['apply']
+    assert not jobs.active
@@ -0,0 +1,60 @@
+import json
+
+from snapshot import BinarySnapshot
+
+
+def day(note, color='#FF6B6B', modified='2024-01-01T10:00:00'):
+    return {'color': color, 'note': note, 'last_modified': modified}
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+
+def test_binary_snapshot_round_trip_and_staleness(tmp_path):
+    json_path = str(tmp_path / 'calendar_data.json')
+    data = {
+        '2024-01-31': day('конец месяца', color='#ff6b6b'),
+        '2024-02-01': day('', color=None, modified='2024-02-01T09:30:00.123456'),
+        '2024-02-02': {'color': [1, 0, 0, 1], 'note': 'старый цвет'},
+        '2024-02-03': {'note': 'без времени', 'extra': True},
+    }
+    data['2024-02-01'].pop('color')
+    write_json(json_path, data)
+    binary = BinarySnapshot(str(tmp_path / 'calendar_data.bin'), json_path)
+
+    assert binary.write(data, binary.source_stat())
+    assert binary.load() == data
+    assert binary.month(2024, 2) == {key: value for key, value in data.items() if key.startswith('2024-02')}
+
+    # Копия, построенная из другой версии JSON, не используется
+    write_json(json_path, {})
+    assert binary.load() is None
+
+
+def test_month_reads_only_its_range(tmp_path):
+    json_path = str(tmp_path / 'calendar_data.json')
+    data = {f'2024-{month:02d}-{day_number:02d}': day(f'{month}.{day_number}')
+            for month in (1, 2, 3) for day_number in (1, 15, 28)}
+    write_json(json_path, data)
+    binary = BinarySnapshot(str(tmp_path / 'calendar_data.bin'), json_path)
+    binary.write(data, binary.source_stat())
+
+    assert binary.month(2024, 2) == {key: data[key] for key in ('2024-02-01', '2024-02-15', '2024-02-28')}
+    assert binary.month(2023, 12) == {}
+    assert binary.month(2024, 4) == {}
+
+
+def test_missing_or_foreign_file_is_not_used(tmp_path):
+    json_path = str(tmp_path / 'calendar_data.json')
+    write_json(json_path, {})
+    binary = BinarySnapshot(str(tmp_path / 'calendar_data.bin'), json_path)
+    assert binary.load() is None
+
+    (tmp_path / 'calendar_data.bin').write_bytes(b'not a snapshot')
+    assert binary.month(2024, 1) is None
+
+    # Без JSON не с чем сверять копию
+    assert not BinarySnapshot(str(tmp_path / 'other.bin'), str(tmp_path / 'missing.json')).write({}, None)
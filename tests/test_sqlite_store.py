@@ -0,0 +1,45 @@
+import json
+
+from storage import SqliteStore
+
+
+def day(note, color='#FF6B6B', modified='2024-01-01T10:00:00'):
+    return {'color': color, 'note': note, 'last_modified': modified}
+
+
+def test_sqlite_round_trip(tmp_path):
+    store = SqliteStore(str(tmp_path / 'calendar_data.db'))
+    store.apply_batch([('2024-01-01', day('a')), ('2024-01-02', day('')), ('2024-02-01', day('b'))])
+    store.apply_batch([('2024-02-01', None)])
+
+    assert store.month(2024, 1) == {'2024-01-01': day('a'), '2024-01-02': day('')}
+    assert store.notes() == [('2024-01-01', day('a'))]
+    assert store.get('2024-02-01') is None
+    store.close()
+
+
+def test_month_query_stays_inside_month(tmp_path):
+    store = SqliteStore(str(tmp_path / 'calendar_data.db'))
+    store.put_many([
+        ('2023-12-31', day('старый год')),
+        ('2024-01-31', day('конец')),
+        ('2024-02-01', day('начало', color=[1, 0, 0, 1])),
+    ])
+
+    assert list(store.month(2024, 1)) == ['2024-01-31']
+    # Старый цвет-список переживает хранение в текстовом столбце
+    assert store.month(2024, 2) == {'2024-02-01': day('начало', color=[1, 0, 0, 1])}
+    assert [date_str for date_str, day_data in store.notes()] == ['2024-02-01', '2024-01-31', '2023-12-31']
+    store.close()
+
+
+def test_json_is_imported_only_once(tmp_path):
+    json_path = tmp_path / 'calendar_data.json'
+    json_path.write_text(json.dumps({'2024-01-01': day('a')}), encoding='utf-8')
+    store = SqliteStore(str(tmp_path / 'calendar_data.db'))
+
+    assert store.import_json_once(str(json_path)) == 1
+    store.delete('2024-01-01')
+    assert store.import_json_once(str(json_path)) == 0
+    assert store.get('2024-01-01') is None
+    store.close()
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from sync import SyncClient, make_server
+
+
+@pytest.fixture
+def server():
+    server = make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, tmp_path, name, batch_size=500):
+    host, port = server.server_address
+    return SyncClient(f'http://{host}:{port}', state_path=str(tmp_path / f'{name}.json'), batch_size=batch_size)
+
+
+def change(date_str, note, modified):
+    data = {'color': '#FF6B6B', 'note': note, 'last_modified': modified} if note is not None else None
+    return {'date': date_str, 'data': data, 'last_modified': modified}
+
+
+def test_push_and_paged_pull(server, tmp_path):
+    phone = client(server, tmp_path, 'phone', batch_size=2)
+    tablet = client(server, tmp_path, 'tablet', batch_size=2)
+    changes = [change(f'2024-01-{day:02d}', f'день {day}', f'2024-01-{day:02d}T10:00:00') for day in range(1, 6)]
+
+    incoming, cursor = phone.sync(changes)
+    assert incoming == []
+    # Свои изменения не возвращаются, но курсор их проходит
+    phone.commit_cursor(cursor)
+    assert phone.cursor == 5
+
+    # Пять изменений приходят тремя страницами по два
+    incoming, cursor = tablet.sync([])
+    assert incoming == changes
+    assert cursor == 5
+
+
+def test_cursor_is_saved_only_on_commit(server, tmp_path):
+    phone = client(server, tmp_path, 'phone')
+    phone.sync([change('2024-01-01', 'a', '2024-01-01T10:00:00')])
+    tablet = client(server, tmp_path, 'tablet')
+
+    incoming, cursor = tablet.sync([])
+    assert len(incoming) == 1
+    # До записи входящих курсор не сдвигается ни в памяти, ни на диске
+    assert client(server, tmp_path, 'tablet').cursor == 0
+
+    tablet.commit_cursor(cursor)
+    tablet.commit_cursor(0)
+    assert client(server, tmp_path, 'tablet').cursor == cursor
+    assert tablet.sync([]) == ([], cursor)
+
+
+def test_older_version_is_rejected_with_server_version(server, tmp_path):
+    phone = client(server, tmp_path, 'phone')
+    tablet = client(server, tmp_path, 'tablet')
+    newer = change('2024-01-01', 'новая', '2024-01-01T12:00:00')
+    phone.sync([newer])
+
+    incoming, cursor = tablet.sync([change('2024-01-01', 'старая', '2024-01-01T09:00:00')])
+
+    assert incoming == [newer, newer]
+    assert server.RequestHandlerClass.state.entries['2024-01-01']['data']['note'] == 'новая'
+
+
+def test_tombstone_reaches_other_device(server, tmp_path):
+    phone = client(server, tmp_path, 'phone')
+    tablet = client(server, tmp_path, 'tablet')
+    phone.sync([change('2024-01-01', 'a', '2024-01-01T10:00:00')])
+    incoming, cursor = tablet.sync([])
+    tablet.commit_cursor(cursor)
+
+    phone.sync([change('2024-01-01', None, '2024-01-02T10:00:00')])
+    incoming, cursor = tablet.sync([])
+
+    assert incoming == [change('2024-01-01', None, '2024-01-02T10:00:00')]
+
+
+def test_interrupted_push_resumes_from_saved_state(server, tmp_path):
+    phone = client(server, tmp_path, 'phone', batch_size=2)
+    phone.mark_dirty([f'2024-01-{day:02d}' for day in range(1, 6)])
+    days = {f'2024-01-{day:02d}': {'note': str(day), 'last_modified': f'2024-01-{day:02d}T10:00:00'}
+            for day in range(1, 6)}
+    changes = phone.take_changes(days.get)
+    post = phone.post
+    calls = []
+
+    def failing_post(path, payload):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError('сеть пропала')
+        return post(path, payload)
+
+    phone.post = failing_post
+    with pytest.raises(ConnectionError):
+        phone.sync(changes)
+
+    # Первый пакет принят, остальные три дня ждут следующего обмена - и после перезапуска
+    assert len(server.RequestHandlerClass.state.entries) == 2
+    restarted = client(server, tmp_path, 'phone', batch_size=2)
+    assert sorted(restarted.dirty) == [change['date'] for change in changes[2:]]
+
+    restarted.sync(restarted.take_changes(days.get))
+    assert sorted(server.RequestHandlerClass.state.entries) == sorted(days)
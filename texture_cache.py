@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+from kivy.core.text import Label as CoreLabel
+from kivy.graphics import Color, Rectangle
+from kivy.uix.button import Button
+from kivy.uix.widget import Widget
+
+
+class TextureCache:
+    """Общий кэш текстур подписей с вытеснением давно не использованных
+
+    Ключ - (текст, размер шрифта, цвет, жирность). Растеризация шрифта
+    выполняется один раз на каждую различную подпись.
+    """
+    def __init__(self, capacity=512):
+        self.capacity = capacity
+        self.textures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font_size, color=(1, 1, 1, 1), bold=False):
+        """Текстура подписи из кэша или только что отрисованная"""
+        key = (text, font_size, tuple(color), bold)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return texture
+        self.misses += 1
+        label = CoreLabel(text=text, font_size=font_size, color=key[2], bold=bold)
+        label.refresh()
+        texture = self.textures[key] = label.texture
+        if len(self.textures) > self.capacity:
+            self.textures.popitem(last=False)
+        return texture
+
+    def stats(self):
+        """Счетчики попаданий и промахов"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.textures)}
+
+
+# Один кэш на процесс: им пользуются сетка месяца и карточки заметок
+text_cache = TextureCache()
+
+
+class CachedTextMixin:
+    """Рисует подпись виджета текстурой из общего кэша"""
+    def init_cached_text(self):
+        self.cached_texture = None
+        with self.canvas.after:
+            Color(1, 1, 1, 1)
+            self.cached_text_rect = Rectangle(size=(0, 0))
+        self.bind(pos=self.place_cached_text, size=self.place_cached_text)
+
+    def set_cached_text(self, text, font_size, color, bold=False):
+        """Задает подпись; пустой текст ничего не рисует"""
+        self.cached_texture = text_cache.get(text, font_size, color, bold) if text else None
+        self.place_cached_text()
+
+    def place_cached_text(self, *args):
+        """Центрирует подпись в виджете"""
+        texture = self.cached_texture
+        if texture is None:
+            self.cached_text_rect.size = (0, 0)
+            return
+        self.cached_text_rect.texture = texture
+        self.cached_text_rect.size = texture.size
+        self.cached_text_rect.pos = (
+            int(self.center_x - texture.width / 2),
+            int(self.center_y - texture.height / 2)
+        )
+
+
+class CachedLabel(CachedTextMixin, Widget):
+    """Неизменяемая подпись (например, день недели) из общего кэша"""
+    def __init__(self, text, font_size, color=(1, 1, 1, 1), bold=False, **kwargs):
+        super().__init__(**kwargs)
+        self.init_cached_text()
+        self.set_cached_text(text, font_size, color, bold)
+
+
+class CachedTextButton(CachedTextMixin, Button):
+    """Кнопка, подпись которой берется из общего кэша"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.init_cached_text()
@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+from kivy.uix.widget import Widget
+from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
+from texture_cache import text_cache
+
+# Мини-месяц: подпись, день недели первого числа (0 - понедельник), цвета
+# дней (rgba или None) и полоса распределения цветов [(rgba, доля)]
+YearMonth = namedtuple('YearMonth', 'title first_weekday day_colors bar')
+
+
+class YearCanvas(Widget):
+    """Обзор года одним виджетом: 12 мини-месяцев из инструкций canvas
+
+    Данные месяцев передаются в set_months уже посчитанными; нажатие на
+    мини-месяц передается в on_month_press(год, месяц).
+    """
+    COLS = 3
+    ROWS = 4
+    BAR_SEGMENTS = 6
+    EMPTY_DAY = (0.95, 0.95, 0.95, 1)
+
+    def __init__(self, on_month_press, **kwargs):
+        super().__init__(**kwargs)
+        self.on_month_press = on_month_press
+        self.padding = dp(6)
+        self.title_height = dp(18)
+        self.bar_height = dp(6)
+        self.font_size = dp(12)
+        self.year = None
+        self.months = []
+
+        # Инструкции создаются один раз и перенастраиваются при перерисовке
+        self.instructions = []
+        with self.canvas:
+            for i in range(12):
+                title_color = Color(1, 1, 1, 0)
+                title = Rectangle()
+                days = [(Color(1, 1, 1, 0), Rectangle()) for day in range(42)]
+                bar = [(Color(1, 1, 1, 0), Rectangle()) for segment in range(self.BAR_SEGMENTS)]
+                self.instructions.append((title_color, title, days, bar))
+        self.bind(pos=self.redraw, size=self.redraw)
+
+    def set_months(self, year, months):
+        """Задает год и 12 мини-месяцев (YearMonth)"""
+        self.year = year
+        self.months = list(months)
+        self.redraw()
+
+    def block_size(self):
+        return self.width / self.COLS, self.height / self.ROWS
+
+    def redraw(self, *args):
+        """Обновляет инструкции всех мини-месяцев"""
+        for index in range(len(self.instructions)):
+            self.draw_month(index)
+
+    def draw_month(self, index):
+        """Обновляет инструкции одного мини-месяца"""
+        title_color, title, days, bar = self.instructions[index]
+        month = self.months[index] if index < len(self.months) else None
+        if month is None:
+            title_color.a = 0
+            for color, rect in days + bar:
+                color.a = 0
+            return
+
+        block_width, block_height = self.block_size()
+        row, col = divmod(index, self.COLS)
+        x = self.x + col * block_width + self.padding
+        top = self.top - row * block_height - self.padding
+        width = block_width - 2 * self.padding
+
+        texture = text_cache.get(month.title, self.font_size)
+        title_color.rgba = (1, 1, 1, 1)
+        title.texture = texture
+        title.size = texture.size
+        title.pos = (int(x), int(top - (self.title_height + texture.height) / 2))
+
+        # Сетка дней между подписью и полосой цветов
+        bottom = top - block_height + 2 * self.padding + self.bar_height
+        grid_top = top - self.title_height
+        cell = min(width / 7, (grid_top - bottom) / 6)
+        gap = max(1, cell * 0.1)
+        for cell_index, (color, rect) in enumerate(days):
+            day = cell_index - month.first_weekday + 1
+            if not 1 <= day <= len(month.day_colors):
+                color.a = 0
+                continue
+            cell_row, cell_col = divmod(cell_index, 7)
+            color.rgba = month.day_colors[day - 1] or self.EMPTY_DAY
+            rect.pos = (x + cell_col * cell, grid_top - (cell_row + 1) * cell)
+            rect.size = (cell - gap, cell - gap)
+
+        # Полоса распределения цветов месяца
+        bar_x = x
+        bar_y = top - block_height + self.padding
+        for segment, (color, rect) in enumerate(bar):
+            if segment >= len(month.bar):
+                color.a = 0
+                continue
+            rgba, fraction = month.bar[segment]
+            color.rgba = rgba
+            rect.pos = (bar_x, bar_y)
+            rect.size = (width * fraction, self.bar_height)
+            bar_x += width * fraction
+
+    def on_touch_down(self, touch):
+        if not self.collide_point(*touch.pos) or self.year is None:
+            return super().on_touch_down(touch)
+        block_width, block_height = self.block_size()
+        col = min(self.COLS - 1, int((touch.x - self.x) // block_width))
+        row = min(self.ROWS - 1, int((self.top - touch.y) // block_height))
+        self.on_month_press(self.year, row * self.COLS + col + 1)
+        return True